@@ -0,0 +1,188 @@
+"""
+Offline end-to-end benchmark for the daily batch.
+
+Runs the real main.py flow (loader, market data, news, charts, user graphs,
+outbox) against the stand-ins in bench/standins.py over synthetic subscription
+sets, one scenario per fresh process so peak RSS is per scenario:
+
+    python -m bench.run_bench --scenarios 10x20,100x200,1000x2000 --out bench_results.json
+    python -m bench.run_bench --compare bench_results.json   # diff against an earlier run
+    python -m bench.run_bench --warm                         # then re-run on the warm caches
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+
+def synthetic_subscriptions(users: int, tickers: int, holdings: int, seed: int = 0):
+    """Subscription rows where a few mega-caps are held by most users (Zipf popularity)."""
+    rng = np.random.default_rng(seed)
+    universe = [f"T{i:04d}" for i in range(tickers)]
+    weights = 1 / np.arange(1, tickers + 1)
+    weights /= weights.sum()
+
+    rows = []
+    for u in range(users):
+        picks = rng.choice(tickers, size=min(holdings, tickers), replace=False, p=weights)
+        for i in picks:
+            rows.append({
+                "email": f"user{u:05d}@bench.test",
+                "ticker": universe[i],
+                "shares": float(rng.integers(1, 200)),
+                "uuid": f"{u:05d}-{i:04d}",
+                "active": True,
+            })
+    return rows
+
+
+def parse_latency(spec: str):
+    """'yf=0.05,groq=0.4' -> {'yf': 0.05, 'groq': 0.4}"""
+    latency = {}
+    for part in filter(None, spec.split(",")):
+        name, seconds = part.split("=")
+        latency[name.strip()] = float(seconds)
+    return latency
+
+
+def run_scenario(users: int, tickers: int, holdings: int, concurrency: int, latency: dict, seed: int,
+                 warm: bool = False):
+    """
+    Runs one scenario in this process and returns its metrics. With `warm`, the
+    batch runs a second time on the caches the first run left behind (under
+    "warm"), which should only fetch bars newer than the stored ones.
+    """
+    # Cold caches, dummy keys and no rate limiting beyond what the stand-ins impose
+    os.environ["NAXERA_DATA_DIR"] = tempfile.mkdtemp(prefix="naxera-bench-")
+    os.environ.setdefault("GROQ_API_KEY", "bench")
+    os.environ.setdefault("TAVILY_API_KEY", "bench")
+    os.environ.setdefault("GROQ_RPM", "1000000")
+    os.environ.setdefault("GROQ_TPM", "1000000000")
+    os.environ.pop("NAXERA_EMAIL_TRANSPORT", None)
+
+    from bench import standins
+    import main
+
+    calls = standins.install(latency)
+    rows = synthetic_subscriptions(users, tickers, holdings, seed)
+
+    def run(*flags):
+        calls.reset()
+        started = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            summary = main.main(["--concurrency", str(concurrency), *flags], supabase=standins.FakeSupabase(rows))
+        return {
+            "wall_time": round(time.perf_counter() - started, 3),
+            "stages": summary["stages"],
+            "succeeded": len(summary["succeeded"]),
+            "failed": len(summary["failed"]),
+            "calls": dict(sorted(calls.counts.items())),
+            "windows": dict(sorted(calls.windows.items())),
+        }
+
+    result = {
+        "users": users,
+        "tickers": tickers,
+        "holdings": len(rows),
+        "unique_tickers": len({r["ticker"] for r in rows}),
+        "concurrency": concurrency,
+        "latency": latency,
+        **run(),
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "children_peak_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+    if warm:
+        # Same run date: without --no-resume every user would just be skipped
+        result["warm"] = run("--no-resume")
+    return result
+
+
+def window_warnings(result: dict):
+    """Requests real Yahoo would have refused, and warm runs that re-fetched full history."""
+    warnings = []
+    if result["calls"].get("yf.rejected"):
+        warnings.append(f"{result['calls']['yf.rejected']} tickers asked for windows Yahoo would refuse")
+    warm = result.get("warm")
+    if warm:
+        if warm["calls"].get("yf.rejected"):
+            warnings.append(f"warm run: {warm['calls']['yf.rejected']} tickers asked for windows Yahoo would refuse")
+        full = {key: n for key, n in warm["windows"].items() if "period=" in key}
+        if full:
+            warnings.append(f"warm run re-downloaded full history: {full}")
+    return warnings
+
+
+def compare(previous: dict, current: dict):
+    before = {s["name"]: s for s in previous["scenarios"]}
+    print("\n--- Comparison (current vs previous) ---")
+    for scenario in current["scenarios"]:
+        old = before.get(scenario["name"])
+        if not old:
+            continue
+        delta = (scenario["wall_time"] - old["wall_time"]) / old["wall_time"] * 100 if old["wall_time"] else 0
+        print(f"{scenario['name']:>12}: {old['wall_time']:.2f}s -> {scenario['wall_time']:.2f}s ({delta:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark for the Naxera AI batch.")
+    parser.add_argument("--scenarios", default="10x20,100x200", help="USERSxTICKERS pairs (default: 10x20,100x200)")
+    parser.add_argument("--holdings", type=int, default=5, help="Tickers per user (default: 5)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", default="yf=0.02,tavily=0.05,groq=0.2,resend=0.02,supabase=0.05",
+                        help="Per-service stand-in delay in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    parser.add_argument("--warm", action="store_true", help="Also re-run each scenario on the caches it left behind")
+    parser.add_argument("--single", help=argparse.SUPPRESS)  # Internal: run one USERSxTICKERS scenario
+    args = parser.parse_args()
+    latency = parse_latency(args.latency)
+
+    if args.single:
+        users, tickers = map(int, args.single.split("x"))
+        result = run_scenario(users, tickers, args.holdings, args.concurrency, latency, args.seed, args.warm)
+        print(json.dumps(result))
+        return
+
+    scenarios = []
+    for name in args.scenarios.split(","):
+        print(f"⏱️ Running scenario {name}...")
+        proc = subprocess.run(
+            [sys.executable, "-m", "bench.run_bench", "--single", name,
+             "--holdings", str(args.holdings), "--concurrency", str(args.concurrency),
+             "--latency", args.latency, "--seed", str(args.seed), *(["--warm"] if args.warm else [])],
+            capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            print(proc.stderr)
+            raise SystemExit(f"❌ Scenario {name} failed")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        result["name"] = name
+        scenarios.append(result)
+        print(f"   {result['wall_time']:.2f}s, stages {result['stages']}, calls {result['calls']}, "
+              f"peak RSS {result['peak_rss_mb']} MB")
+        if "warm" in result:
+            print(f"   warm: {result['warm']['wall_time']:.2f}s, calls {result['warm']['calls']}, "
+                  f"windows {result['warm']['windows']}")
+        for warning in window_warnings(result):
+            print(f"   ⚠️ {warning}")
+
+    results = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "scenarios": scenarios}
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+Local stand-ins for every external service the pipeline talks to.
+
+install() patches yfinance, Tavily, the Groq LLM and Resend in-process so the
+real main.py / run_agent / graph code runs unchanged, but every call replays a
+recorded response (bench/fixtures/recorded.json) after a configurable delay and
+is counted. Price bars are generated per ticker from a seeded random walk, so
+any universe size can be served. Every price window asked for is recorded, and
+windows Yahoo would refuse (a non-date start, intraday bars beyond 60 days)
+come back empty and are counted as "yf.rejected".
+"""
+import asyncio
+import datetime
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "recorded.json")
+
+with open(FIXTURES) as f:
+    RECORDED = json.load(f)
+
+
+class CallLog:
+    """Thread-safe external call counter, plus the price windows that were asked for."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.windows = Counter()  # "30m start=-6d" -> tickers requested with that window
+        self._lock = threading.Lock()
+
+    def hit(self, name: str, n: int = 1):
+        with self._lock:
+            self.counts[name] += n
+
+    def window(self, key: str, n: int = 1):
+        with self._lock:
+            self.windows[key] += n
+
+    def reset(self):
+        with self._lock:
+            self.counts.clear()
+            self.windows.clear()
+
+
+calls = CallLog()
+latency = {}
+
+
+def _delay(service: str):
+    seconds = latency.get(service, 0.0)
+    if seconds:
+        time.sleep(seconds)
+
+
+# --- yfinance ---
+_bars = {}
+_bars_lock = threading.Lock()
+
+
+def _walk(ticker: str, index):
+    rng = np.random.default_rng(zlib.crc32(ticker.encode("utf-8")))
+    start = rng.uniform(20, 500)
+    close = start * np.exp(np.cumsum(rng.normal(0.0003, 0.018, len(index))))
+    spread = close * rng.uniform(0.002, 0.015, len(index))
+    return pd.DataFrame(
+        {
+            "Open": close - spread / 2,
+            "High": close + spread,
+            "Low": close - spread,
+            "Close": close,
+            "Volume": rng.integers(1_000_000, 50_000_000, len(index)).astype(float),
+        },
+        index=index,
+    )
+
+
+def bars(ticker: str, interval: str = "1d"):
+    """A full synthetic history per (ticker, interval), generated once."""
+    key = (ticker, interval)
+    with _bars_lock:
+        if key not in _bars:
+            today = pd.Timestamp.today().normalize()
+            if interval == "1d":
+                index = pd.bdate_range(end=today - pd.Timedelta(days=1), periods=520)
+            else:
+                days = pd.bdate_range(end=today - pd.Timedelta(days=1), periods=30)
+                index = pd.DatetimeIndex(
+                    [d + pd.Timedelta(hours=13, minutes=30 + 30 * i) for d in days for i in range(13)]
+                ).tz_localize("UTC")
+            _bars[key] = _walk(ticker, index)
+        return _bars[key]
+
+
+_PERIOD_DAYS = {"5d": 5, "1mo": 21, "3mo": 63, "6mo": 126, "1y": 252, "2y": 504}
+# Calendar days each period reaches back, for Yahoo's intraday limit
+_PERIOD_REACH = {"1d": 1, "5d": 7, "1mo": 31, "3mo": 92, "6mo": 183, "1y": 366, "2y": 731}
+# Yahoo only serves intraday bars from the last 60 days
+INTRADAY_REACH_DAYS = 60
+
+
+class RejectedWindow(ValueError):
+    pass
+
+
+def _check_window(period, start, interval):
+    """
+    Records the window and raises RejectedWindow for one real Yahoo would
+    refuse, so a request bug shows up here instead of as a healthy run.
+    Returns the window key, e.g. "1d period=1y" or "30m start=-6d".
+    """
+    if start is not None:
+        if not isinstance(start, (str, datetime.date)):
+            raise RejectedWindow(f"start={start!r} is not a date")
+        reach = (pd.Timestamp.today().normalize() - pd.Timestamp(start).tz_localize(None)).days
+        key = f"{interval} start=-{reach}d"
+    else:
+        if period not in _PERIOD_REACH:
+            raise RejectedWindow(f"invalid period {period!r}")
+        reach = _PERIOD_REACH[period]
+        key = f"{interval} period={period}"
+    if interval != "1d" and reach > INTRADAY_REACH_DAYS:
+        raise RejectedWindow(f"{interval} data not available for {key}: must be within the last {INTRADAY_REACH_DAYS} days")
+    return key
+
+
+def _window(frame, period=None, start=None, interval="1d"):
+    if start is not None:
+        cutoff = pd.Timestamp(start)
+        if frame.index.tz is not None:
+            cutoff = cutoff.tz_localize(frame.index.tz)
+        return frame[frame.index >= cutoff]
+    days = _PERIOD_DAYS.get(period or "1mo", 21)
+    return frame.iloc[-days * (1 if interval == "1d" else 13):]
+
+
+def fake_download(tickers, period=None, interval="1d", start=None, **kwargs):
+    _delay("yf")
+    calls.hit("yf.download")
+    tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+    try:
+        calls.window(_check_window(period, start, interval), len(tickers))
+    except RejectedWindow as e:
+        # Like yfinance: the error is printed and no bars come back
+        calls.hit("yf.rejected", len(tickers))
+        print(f"{len(tickers)} Failed downloads: {e}")
+        return pd.DataFrame()
+    frames = {t: _window(bars(t, interval), period, start, interval) for t in tickers}
+    return pd.concat(frames, axis=1)
+
+
+class FakeTicker:
+    def __init__(self, ticker: str):
+        self.ticker = ticker
+
+    @property
+    def info(self):
+        _delay("yf")
+        calls.hit("yf.info")
+        info = dict(RECORDED["yfinance_info"])
+        info["currentPrice"] = round(float(bars(self.ticker)["Close"].iloc[-1]), 2)
+        return info
+
+    @property
+    def fast_info(self):
+        _delay("yf")
+        calls.hit("yf.quote")
+        return {"lastPrice": round(float(bars(self.ticker)["Close"].iloc[-1]), 2)}
+
+    def history(self, period="1mo", interval="1d", start=None, **kwargs):
+        _delay("yf")
+        calls.hit("yf.history")
+        try:
+            calls.window(_check_window(None if start is not None else period, start, interval))
+        except RejectedWindow as e:
+            calls.hit("yf.rejected")
+            print(f"{self.ticker}: {e}")
+            return pd.DataFrame()
+        return _window(bars(self.ticker, interval), period, start, interval).copy()
+
+
+# --- Tavily ---
+def fake_search(self, query, **kwargs):
+    _delay("tavily")
+    calls.hit("tavily.search")
+    return dict(RECORDED["tavily_search"], query=query)
+
+
+# --- Groq ---
+class _Reply:
+    def __init__(self, content):
+        self.content = content
+        self.usage_metadata = {"input_tokens": 450, "output_tokens": 380, "total_tokens": 830}
+
+
+class FakeLLM:
+    """Answers both single and multi-ticker analyst prompts with the recorded completion."""
+
+    model_name = "llama-3.3-70b-versatile"
+
+    def _answer(self, messages):
+        prompt = messages[-1].content
+        if "JSON array" in prompt:
+            tickers = re.findall(r"- Ticker: (\S+)", prompt)
+            return _Reply(json.dumps([dict(RECORDED["groq_completion"], ticker=t) for t in tickers]))
+        return _Reply(json.dumps(RECORDED["groq_completion"]))
+
+    def invoke(self, messages, **kwargs):
+        _delay("groq")
+        calls.hit("groq.invoke")
+        return self._answer(messages)
+
+    async def ainvoke(self, messages, **kwargs):
+        seconds = latency.get("groq", 0.0)
+        if seconds:
+            await asyncio.sleep(seconds)
+        calls.hit("groq.invoke")
+        return self._answer(messages)
+
+
+# --- Resend ---
+def fake_email_send(params, options=None):
+    _delay("resend")
+    calls.hit("resend.send")
+    return dict(RECORDED["resend_send"])
+
+
+def fake_batch_send(params, options=None):
+    _delay("resend")
+    calls.hit("resend.batch")
+    return {"data": [dict(RECORDED["resend_send"]) for _ in params]}
+
+
+# --- Supabase ---
+class _Response:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    """The slice of the PostgREST query builder the subscription loader uses."""
+
+    def __init__(self, rows, columns=None, order=(), limit=None):
+        self.rows = rows
+        self.columns = columns
+        self._order = order
+        self._limit = limit
+
+    def _with(self, rows=None, **changes):
+        options = {"columns": self.columns, "order": self._order, "limit": self._limit, **changes}
+        return FakeQuery(self.rows if rows is None else rows, **options)
+
+    def select(self, columns="*"):
+        return self._with(columns=None if columns == "*" else columns.split(","))
+
+    def eq(self, column, value):
+        return self._with([r for r in self.rows if r.get(column) == value])
+
+    def gt(self, column, value):
+        return self._with([r for r in self.rows if r.get(column) > value])
+
+    def order(self, column):
+        return self._with(order=self._order + (column,))
+
+    def limit(self, n):
+        return self._with(limit=n)
+
+    def execute(self):
+        _delay("supabase")
+        calls.hit("supabase.select")
+        rows = sorted(self.rows, key=lambda r: [r[c] for c in self._order]) if self._order else self.rows
+        rows = rows[:self._limit] if self._limit is not None else rows
+        if self.columns:
+            rows = [{c: r[c] for c in self.columns} for r in rows]
+        return _Response(rows)
+
+
+class FakeSupabase:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def table(self, name):
+        return FakeQuery(self.rows)
+
+
+def install(service_latency: dict = None):
+    """Patches every external client; returns the shared CallLog."""
+    import resend
+    import tavily
+    import yfinance
+
+    import src.clients
+
+    latency.clear()
+    latency.update(service_latency or {})
+    calls.reset()
+
+    yfinance.download = fake_download
+    yfinance.Ticker = FakeTicker
+    tavily.TavilyClient.search = fake_search
+    llm = FakeLLM()
+    src.clients.get_llm = lambda: llm
+    resend.Emails.send = fake_email_send
+    resend.Batch.send = fake_batch_send
+    return calls
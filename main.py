@@ -1,59 +1,231 @@
 import os
+import time
+import argparse
+from contextlib import contextmanager
+from datetime import date
+from itertools import islice
 from dotenv import load_dotenv
-from supabase import create_client, Client
-from src.agent import run_agent
+from src.agent import get_app
+from src.clients import get_supabase, get_tavily
+from src.charts import ChartCache
+from src.fundamentals import Fundamentals
+from src.checkpoints import RunCheckpoints
+from src.llm_cache import AnalysisCache
+from src.market_data import MarketData
+from src.news import NewsCache, NewsService
+from src.outbox import Outbox
+from src.report import FragmentCache
+from src.runner import print_summary, run_batch
+from src.sharding import Shard
+from src.subscriptions import DEFAULT_PAGE_SIZE, iter_portfolios
+from src.tracing import tracer
 
 load_dotenv()
 
-# Setup Supabase Connection
-url = os.getenv("SUPABASE_URL")
-key = os.getenv("SUPABASE_SERVICE_KEY")
-supabase: Client = create_client(url, key)
+@contextmanager
+def stage(timings: dict, name: str):
+    """Adds the wall time of one pipeline stage to `timings` (stages repeat once per block)."""
+    started = time.perf_counter()
+    try:
+        with tracer.span(f"stage.{name}"):
+            yield
+    finally:
+        timings[name] = round(timings.get(name, 0.0) + time.perf_counter() - started, 3)
+
+def blocks(portfolios, size: int):
+    """Groups an iterable of (email, portfolio) pairs into dicts of at most `size` users."""
+    portfolios = iter(portfolios)
+    while True:
+        block = dict(islice(portfolios, size))
+        if not block:
+            return
+        yield block
+
+def finished_users(block: dict, checkpoints: RunCheckpoints, outbox: Outbox):
+    """Users whose graph completed earlier in this run date and whose email went out."""
+    app = get_app(checkpoints.saver)
+    return [email for email in block if checkpoints.progress(app, email) == () and outbox.delivered(email)]
+
+def run_pipeline(user_portfolios, concurrency: int = 4, block_size: int = 500, run_date: str = None,
+                 resume: bool = True):
+    """
+    Runs the whole batch; returns the summary with per-stage timings.
+
+    `user_portfolios` is a dict or any iterable of (email, portfolio) pairs,
+    e.g. the streaming Supabase loader. Users are taken `block_size` at a time:
+    only tickers new to the run are fetched and charted for each block, so the
+    first reports go out before the last subscriptions are read.
+
+    With `resume`, every user's progress for `run_date` is checkpointed: a
+    re-run skips users who already got today's report and continues the rest
+    from their last completed node.
+    """
+    if isinstance(user_portfolios, dict):
+        user_portfolios = user_portfolios.items()
+
+    started = time.perf_counter()
+    timings = {}
+    summary = {"users": 0, "succeeded": [], "failed": {}, "skipped": [], "wall_time": 0.0}
+    run_date = run_date or date.today().isoformat()
+    # Loads pandas; everything else heavy is imported on first use
+    from src.price_store import PriceStore
+    batch_size = int(os.getenv("YF_BATCH_SIZE", "100"))
+    per_ticker_news = os.getenv("NAXERA_TICKER_NEWS", "0") == "1"
+
+    # Fetched ONCE per unique ticker, shared by every user below
+    market_data = MarketData(batch_size=batch_size, store=PriceStore(), fundamentals=Fundamentals())
+    # News is the same for everyone: one market search per run (+ one per ticker if enabled)
+    news = NewsService(get_tavily(), cache=NewsCache(), per_ticker=per_ticker_news)
+    # Each ticker's chart is drawn once, in parallel across cores
+    charts = ChartCache()
+    # Analyst answers are shared by every holder of a ticker (and survive re-runs)
+    analysis_cache = AnalysisCache()
+    # Rendered stock cards are reused across every email that holds the ticker
+    fragments = FragmentCache()
+    # Reports are queued and delivered in chunks, at most once per user per day
+    outbox = Outbox(run_date=run_date)
+    # Per-user progress for this run date, so a crashed run can pick up where it stopped
+    checkpoints = RunCheckpoints(run_date=run_date) if resume else None
+
+    seen_tickers = set()
+    for block in blocks(user_portfolios, block_size):
+        if checkpoints is not None:
+            done = finished_users(block, checkpoints, outbox)
+            if done:
+                print(f"⏭️ {len(done)} users already have today's report, skipping them.")
+                summary["users"] += len(done)
+                summary["succeeded"] += done
+                summary["skipped"] += done
+                block = {email: portfolio for email, portfolio in block.items() if email not in done}
+            if not block:
+                continue
+
+        new_tickers = {item["ticker"] for portfolio in block.values() for item in portfolio} - seen_tickers
+        seen_tickers |= new_tickers
+        print(f"📊 Processing portfolios for {len(block)} users ({len(new_tickers)} new tickers)...\n")
+
+        # 1. Market data for tickers this run has not seen yet
+        with stage(timings, "market_data"):
+            market_data.prefetch(new_tickers)
+        print(
+            f"✅ Market data ready ({market_data.calls} bar requests, fundamentals "
+            f"{market_data.fundamentals.stats()} for {len(seen_tickers)} tickers).\n"
+        )
+
+        # 2. News
+        with stage(timings, "news"):
+            news.prefetch(new_tickers)
+        print(f"✅ News ready ({news.calls} Tavily requests).\n")
+
+        # 3. Charts
+        with stage(timings, "charts"):
+            charts.render(new_tickers, market_data.intraday)
+        print(f"✅ Charts ready: {charts.stats()}\n")
+
+        # 4. Run every USER's pipeline (not each ticker), a few at a time
+        with stage(timings, "users"):
+            result = run_batch(
+                block, concurrency=concurrency,
+                market_data=market_data, news=news, charts=charts,
+                analysis_cache=analysis_cache, fragments=fragments, outbox=outbox, checkpoints=checkpoints,
+            )
+        summary["users"] += result["users"]
+        summary["succeeded"] += result["succeeded"]
+        summary["failed"].update(result["failed"])
+
+    with stage(timings, "outbox_flush"):
+        outbox.flush()
+    # The whole run, prefetching and delivery included
+    summary["wall_time"] = time.perf_counter() - started
+    # The graph only queues reports: a user has succeeded once their email actually went out
+    if outbox.failed:
+        summary["succeeded"] = [email for email in summary["succeeded"] if email not in outbox.failed]
+        summary["failed"].update({email: f"email not delivered: {error}" for email, error in outbox.failed.items()})
+
+    print(f"🧠 Analysis cache: {analysis_cache.stats()}")
+    print(f"🧩 Card fragments: {fragments.hits} reused, {fragments.misses} rendered")
+    print(f"📬 Outbox: {outbox.stats()}")
+    if checkpoints is not None:
+        checkpoints.close()
+    summary["stages"] = timings
+    return summary
+
+def main(argv=None, supabase=None):
+    parser = argparse.ArgumentParser(description="Send the daily Naxera AI portfolio reports.")
+    parser.add_argument(
+        "--concurrency", type=int, default=int(os.getenv("NAXERA_CONCURRENCY", "4")),
+        help="How many user pipelines run at the same time (default: 4)",
+    )
+    parser.add_argument(
+        "--page-size", type=int, default=int(os.getenv("NAXERA_PAGE_SIZE", str(DEFAULT_PAGE_SIZE))),
+        help=f"Subscription rows per Supabase request (default: {DEFAULT_PAGE_SIZE})",
+    )
+    parser.add_argument(
+        "--block-size", type=int, default=int(os.getenv("NAXERA_BLOCK_SIZE", "500")),
+        help="Users whose data is prefetched and processed together (default: 500)",
+    )
+    parser.add_argument(
+        "--shard-index", type=int, default=int(os.getenv("NAXERA_SHARD_INDEX", "0")),
+        help="Which slice of the users this worker handles (0-based)",
+    )
+    parser.add_argument(
+        "--shard-count", type=int, default=int(os.getenv("NAXERA_SHARD_COUNT", "1")),
+        help="How many workers split the users between them (default: 1)",
+    )
+    parser.add_argument(
+        "--manifest", default=None,
+        help="Where to write this shard's result manifest (default: manifests/<date>-shard-<i>-of-<n>.json when sharded)",
+    )
+    parser.add_argument(
+        "--run-date", default=date.today().isoformat(),
+        help="Run date to process or resume, YYYY-MM-DD (default: today)",
+    )
+    parser.add_argument(
+        "--no-resume", dest="resume", action="store_false",
+        help="Don't checkpoint progress or skip users already handled for this run date",
+    )
+    parser.add_argument(
+        "--trace", default=os.getenv("NAXERA_TRACE"),
+        help="Write a JSON-lines trace of every node and external call to this file",
+    )
+    args = parser.parse_args(argv)
+    shard = Shard(args.shard_index, args.shard_count)
+    if args.trace and not tracer.enabled:
+        tracer.enable(args.trace)
 
-if __name__ == "__main__":
     print("--- Starting Naxera AI (Portfolio Mode) ---")
-    
-    # 1. Fetch all ACTIVE subscriptions
-    print("📡 Fetching active subscriptions from Supabase...")
-    response = supabase.table("subscriptions").select("*").eq("active", True).execute()
-    subscriptions = response.data
-    
-    if not subscriptions:
-        print("⚠️ No active subscriptions found in database.")
-        exit(0)
-    else:
-        print(f"✅ Found {len(subscriptions)} total active tickers.")
-
-    # 2. GROUP BY USER
-    user_portfolios = {}
-    for sub in subscriptions:
-        email = sub['email']
-        if email not in user_portfolios:
-            user_portfolios[email] = []
-        
-        user_portfolios[email].append({
-            "ticker": sub['ticker'],
-            "shares": float(sub['shares']),
-            "uuid": sub.get('uuid')
-        })
-
-    print(f"📊 Processing portfolios for {len(user_portfolios)} unique users...\n")
-
-    # 3. Loop through each USER (not each ticker)
-    for email, portfolio in user_portfolios.items():
-        try:
-            print(f"--- 🤖 Processing Portfolio for {email} ---")
-            
-            inputs = {
-                "user_email": email, 
-                "portfolio": portfolio, 
-                "retry_count": 0
-            }
-            run_agent(inputs)
-            
-            print(f"✅ Finished sending to {email}")
-            
-        except Exception as e:
-            print(f"❌ Failed to process {email}: {e}")
-            
-    print("\n--- Batch Job Complete ---")
\ No newline at end of file
+
+    # Setup Supabase Connection
+    if supabase is None:
+        supabase = get_supabase()
+
+    print("📡 Streaming active subscriptions from Supabase...")
+    if shard.count > 1:
+        print(f"🧩 Running shard {shard.index + 1} of {shard.count}")
+    # Every shard reads the same stream and keeps only the users hashed to it
+    user_portfolios = shard.select(iter_portfolios(supabase, page_size=args.page_size))
+    summary = run_pipeline(
+        user_portfolios, concurrency=args.concurrency, block_size=args.block_size,
+        run_date=args.run_date, resume=args.resume,
+    )
+
+    if args.manifest or shard.count > 1:
+        path = args.manifest or shard.default_manifest_path(args.run_date)
+        shard.write_manifest(path, summary, args.run_date)
+        print(f"🧾 Shard manifest written to {path}")
+
+    if not summary["users"]:
+        print("⚠️ No active subscriptions found in database." if shard.count == 1 else "⚠️ No users hashed to this shard.")
+        return None
+
+    print_summary(summary)
+    if tracer.enabled:
+        print("\n--- 🔬 Trace Summary ---")
+        print(tracer.format_summary(tracer.write_summary()))
+        print(f"Trace written to {tracer.path}")
+        tracer.close()
+    print("\n--- Batch Job Complete ---")
+    return summary
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,46 @@
-import os
-import json
-import yfinance as yf
-import pandas as pd
-from typing import TypedDict, Literal
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
 
-from langgraph.graph import StateGraph, END
-from langchain_groq import ChatGroq
-from tavily import TavilyClient
-from langchain_core.messages import HumanMessage
+from src import clients
+from src.clients import MODEL_NAME, TEMPERATURE
 from src.state import AgentState
-from src.tools import get_financial_metrics, send_email, generate_stock_chart 
+from src.analyst import Analyst
+from src.market_data import MarketData
+from src.news import NewsService
+from src.report import render_report
+from src.tracing import traced
+from src.tools import send_email, generate_stock_chart, encode_attachment
+
+if TYPE_CHECKING:
+    from langchain_core.runnables import RunnableConfig
 
 load_dotenv()
 
-# --- SETUP ---
-tavily = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
-llm = ChatGroq(
-    model="llama-3.3-70b-versatile",
-    temperature=0,
-    api_key=os.getenv("GROQ_API_KEY")
-)
+def _resource(config: RunnableConfig, name: str):
+    """Run-scoped resources (caches shared across users) ride along in the graph config."""
+    return (config or {}).get("configurable", {}).get(name)
 
 # --- NODE 1: RESEARCHER ---
-def search_node(state: AgentState):
+def search_node(state: AgentState, config: RunnableConfig):
+    # Shared run-wide news from main.py; a standalone run asks Tavily itself
+    news = _resource(config, "news") or NewsService(clients.get_tavily())
     print("📰 Fetching broad market news...")
-    try:
-        # For a portfolio, broad market news is better
-        response = tavily.search(query="US stock market pre-market news today", topic="news", days=1)
-        news_text = " ".join([res['title'] for res in response.get('results', [])[:4]])
-    except Exception:
-        news_text = "Standard market conditions."
+    news_text = news.market_news()
 
     return {"news_results": [news_text]}
 
 # --- NODE 2: DATA COLLECTOR ---
-def data_collection_node(state: AgentState):
+def data_collection_node(state: AgentState, config: RunnableConfig):
     portfolio = state["portfolio"]
+    # Shared run-wide cache from main.py; a standalone run gets a private one
+    market_data = _resource(config, "market_data") or MarketData()
+    news = _resource(config, "news")
+    chart_cache = _resource(config, "charts")
     portfolio_data = []
-    chart_paths = []
+    charts = []
     total_value = 0.0
 
     print(f"📊 Fetching data, charts, and calculating Quant indicators for {len(portfolio)} assets...")
@@ -48,41 +50,32 @@ def data_collection_node(state: AgentState):
         shares = item["shares"]
         
         # Get Standard Data & Chart
-        data = get_financial_metrics(ticker)
-        chart_file = generate_stock_chart(ticker)
-        if chart_file:
-            chart_paths.append(chart_file)
+        data = market_data.metrics(ticker)
+        # With a run-wide chart cache the publisher attaches from it; otherwise render here
+        if chart_cache is None:
+            try:
+                intraday = market_data.intraday(ticker)
+            except Exception as e:
+                print(f"❌ Failed to fetch intraday bars for {ticker}: {e}")
+                intraday = None
+            chart_png = generate_stock_chart(ticker, hist=intraday) if intraday is not None else None
+            if chart_png:
+                # Base64 keeps the graph state plain JSON-friendly data
+                charts.append({"filename": f"{ticker}_chart.png", "content": encode_attachment(chart_png)})
             
-        # --- NEW: CALCULATE TECHNICAL INDICATORS ---
+        # --- TECHNICAL INDICATORS (computed once per run for all tickers) ---
         try:
-            stock = yf.Ticker(ticker)
-            hist = stock.history(period="1y") # Need 1 year for the 200-day average
-            
-            if not hist.empty and len(hist) > 200:
-                close_px = hist['Close']
-                
-                # Moving Averages
-                sma_50 = close_px.rolling(window=50).mean().iloc[-1]
-                sma_200 = close_px.rolling(window=200).mean().iloc[-1]
-                
-                # RSI (14-Day)
-                delta = close_px.diff()
-                gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-                loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-                rs = gain / loss
-                rsi = 100 - (100 / (1 + rs))
-                rsi_14 = rsi.iloc[-1]
-                
-                quant_data = {
-                    "sma_50": f"${round(sma_50, 2)}",
-                    "sma_200": f"${round(sma_200, 2)}",
-                    "rsi": round(rsi_14, 2)
-                }
-            else:
-                quant_data = {"sma_50": "N/A", "sma_200": "N/A", "rsi": "N/A"}
+            indicators = market_data.indicators(ticker)
         except Exception as e:
             print(f"⚠️ Quant error for {ticker}: {e}")
-            quant_data = {"sma_50": "N/A", "sma_200": "N/A", "rsi": "N/A"}
+            indicators = {}
+
+        sma_50, sma_200, rsi_14 = (indicators.get(k) for k in ("sma_50", "sma_200", "rsi_14"))
+        quant_data = {
+            "sma_50": f"${round(sma_50, 2)}" if sma_50 is not None else "N/A",
+            "sma_200": f"${round(sma_200, 2)}" if sma_200 is not None else "N/A",
+            "rsi": round(rsi_14, 2) if rsi_14 is not None else "N/A"
+        }
         # ---------------------------------------------
             
         # Calculate Value
@@ -98,189 +91,94 @@ def data_collection_node(state: AgentState):
             "value": value,
             "pe_ratio": data.get("pe_ratio", "N/A"),
             "target_mean_price": data.get("target_mean_price", "N/A"),
-            "quant": quant_data # Store our new math
+            "quant": quant_data, # Store our new math
+            "indicators": indicators, # Raw values (EMA, MACD, Bollinger, ATR, ...)
+            "news": news.headlines(ticker) if news else "" # Ticker headlines (per-ticker news mode)
         })
         
+    # --- PORTFOLIO RISK (a weights-vector product on the run's shared returns matrix) ---
+    values = {}
+    for stock in portfolio_data:
+        ticker = stock["ticker"].upper()
+        values[ticker] = values.get(ticker, 0) + stock["value"]
+    try:
+        risk = market_data.returns().portfolio_risk(values)
+    except Exception as e:
+        print(f"⚠️ Risk error: {e}")
+        risk = {}
+
     return {
         "portfolio_data": portfolio_data, 
         "total_value": total_value, 
-        "chart_paths": chart_paths
+        "risk": risk,
+        "charts": charts
     }
 
 # --- NODE 3: ANALYST ---
-def analyze_node(state: AgentState):
+def analyze_node(state: AgentState, config: RunnableConfig):
     news_content = state.get("news_results", [""])[0]
     portfolio_data = state.get("portfolio_data", [])
     total_value = state.get("total_value", 0)
+    analyst = Analyst(
+        clients.get_llm(), MODEL_NAME, TEMPERATURE,
+        cache=_resource(config, "analysis_cache"),
+        limiter=_resource(config, "rate_limiter"),
+    )
     
     print("🧠 Synthesizing Deep-Dive Quant Reports...")
+    # All of this user's analyses go out concurrently (cached ones are free)
+    analyses = analyst.run(portfolio_data, news_content)
 
-    cards_html = ""
     # Your Vercel link is safe right here!
     user_uuid = state["portfolio"][0].get("uuid", "")
     manage_url = f"https://naxera-ai-delta.vercel.app/manage?id={user_uuid}"
-    
-    for stock in portfolio_data:
-        ticker = stock['ticker']
-        quant = stock['quant']
-        
-        # NEW PROMPT: Force the AI to format JSON safely
-        prompt = f"""
-        You are a Senior Quantitative Investment Analyst at Goldman Sachs.
-        Ticker: {ticker}
-        Broad Market News: {news_content}
-        Financials: Price ${stock['price']}, PE {stock['pe_ratio']}
-        Technical Indicators: 50-Day SMA: {quant['sma_50']}, 200-Day SMA: {quant['sma_200']}, RSI (14-day): {quant['rsi']}.
-        
-        Output a valid JSON object with exactly 4 fields. 
-        CRITICAL RULES FOR JSON: 
-        - Use the literal characters \\n for paragraph breaks. Do NOT use actual line breaks inside the string values.
-        - Do NOT use double quotes inside your text (use single quotes ' instead).
-        
-        1. "quant_analysis": A lengthy, in-depth 2-to-3 paragraph technical and quantitative analysis. Discuss the moving averages (trend), the RSI (momentum), and what this means for institutional buyers.
-        2. "summary": A concise 3-sentence executive summary.
-        3. "verdict": A single word: "Buy", "Sell", or "Hold".
-        4. "rationale": A 1-sentence explanation of the verdict.
-        
-        Return ONLY the JSON string.
-        """
-        
-        raw_response = llm.invoke([HumanMessage(content=prompt)]).content
-        
-        try:
-            cleaned_response = raw_response.replace("```json", "").replace("```", "").strip()
-            # NEW: strict=False tells Python to forgive accidental line breaks!
-            analysis = json.loads(cleaned_response, strict=False)
-        except Exception as e:
-            print(f"⚠️ JSON Parse Error for {ticker}: {e}")
-            analysis = {
-                "quant_analysis": "Quantitative data currently processing.",
-                "summary": "Analysis data temporarily unavailable.",
-                "verdict": "Hold",
-                "rationale": "Pending manual review."
-            }
 
-        verdict = analysis.get('verdict', 'Hold').upper()
-        verdict_color = "#166534" if verdict == "BUY" else "#991b1b" if verdict == "SELL" else "#854d0e"
-
-        # Build the HTML with the new Quant Section and Data Mini-Grid
-        cards_html += f"""
-        <div style="background-color: #ffffff; border-radius: 8px; overflow: hidden; box-shadow: 0 4px 6px rgba(0,0,0,0.1); margin-bottom: 20px;">
-            <div style="padding: 15px 25px; border-bottom: 1px solid #e5e7eb; background-color: #f9fafb; display: flex; justify-content: space-between; align-items: center;">
-                <h2 style="margin: 0; font-size: 20px; color: #111827; font-weight: bold;">{ticker} <span style="font-size: 14px; color: #6b7280; font-weight: normal; margin-left: 8px;">({stock['shares']} shares)</span></h2>
-                <h2 style="margin: 0; font-size: 20px; color: #111827;">${stock['value']:,.2f}</h2>
-            </div>
-            
-            <div style="padding: 25px;">
-                
-                <h3 style="margin-top: 0; color: #374151; font-size: 16px; border-bottom: 2px solid #e5e7eb; padding-bottom: 8px;">Quantitative & Technical Analysis</h3>
-                
-                <div style="display: flex; gap: 10px; margin-bottom: 20px;">
-                    <div style="flex: 1; background-color: #f3f4f6; padding: 12px; border-radius: 6px; text-align: center; border: 1px solid #e5e7eb;">
-                        <span style="display: block; font-size: 11px; color: #6b7280; text-transform: uppercase; font-weight: bold; margin-bottom: 4px;">RSI (14-Day)</span>
-                        <span style="font-size: 18px; font-weight: bold; color: #111827;">{quant['rsi']}</span>
-                    </div>
-                    <div style="flex: 1; background-color: #f3f4f6; padding: 12px; border-radius: 6px; text-align: center; border: 1px solid #e5e7eb;">
-                        <span style="display: block; font-size: 11px; color: #6b7280; text-transform: uppercase; font-weight: bold; margin-bottom: 4px;">50-Day SMA</span>
-                        <span style="font-size: 18px; font-weight: bold; color: #111827;">{quant['sma_50']}</span>
-                    </div>
-                    <div style="flex: 1; background-color: #f3f4f6; padding: 12px; border-radius: 6px; text-align: center; border: 1px solid #e5e7eb;">
-                        <span style="display: block; font-size: 11px; color: #6b7280; text-transform: uppercase; font-weight: bold; margin-bottom: 4px;">200-Day SMA</span>
-                        <span style="font-size: 18px; font-weight: bold; color: #111827;">{quant['sma_200']}</span>
-                    </div>
-                </div>
-
-                <p style="color: #4b5563; line-height: 1.7; margin-bottom: 30px; font-size: 14px;">
-                    {analysis.get('quant_analysis')}
-                </p>
-
-                <h3 style="margin-top: 0; color: #374151; font-size: 16px; border-bottom: 2px solid #e5e7eb; padding-bottom: 8px;">Executive Summary</h3>
-                <p style="color: #4b5563; line-height: 1.6; margin-bottom: 25px; font-size: 14px;">
-                    {analysis.get('summary')}
-                </p>
-
-                <h3 style="margin-top: 0; color: #374151; font-size: 16px; border-bottom: 2px solid #e5e7eb; padding-bottom: 8px;">Key Metrics</h3>
-                <table style="width: 100%; margin-bottom: 25px; border-collapse: collapse; font-size: 14px;">
-                    <tr>
-                        <td style="padding: 10px; background-color: #f9fafb; border: 1px solid #e5e7eb; font-weight: bold; color: #374151; width: 30%;">Price</td>
-                        <td style="padding: 10px; border: 1px solid #e5e7eb; color: #111827;">${stock['price']:,.2f}</td>
-                    </tr>
-                    <tr>
-                        <td style="padding: 10px; background-color: #f9fafb; border: 1px solid #e5e7eb; font-weight: bold; color: #374151;">Target</td>
-                        <td style="padding: 10px; border: 1px solid #e5e7eb; color: #111827;">${stock['target_mean_price']}</td>
-                    </tr>
-                    <tr>
-                        <td style="padding: 10px; background-color: #f9fafb; border: 1px solid #e5e7eb; font-weight: bold; color: #374151;">P/E Ratio</td>
-                        <td style="padding: 10px; border: 1px solid #e5e7eb; color: #111827;">{stock['pe_ratio']}</td>
-                    </tr>
-                </table>
-
-                <div style="background-color: {verdict_color}15; border-left: 4px solid {verdict_color}; padding: 15px;">
-                    <strong style="color: {verdict_color}; font-size: 16px; display: block; margin-bottom: 5px;">VERDICT: {verdict}</strong>
-                    <span style="color: #374151; font-size: 14px;">{analysis.get('rationale')}</span>
-                </div>
-            </div>
-        </div>
-        """
-
-    # 3. Assemble the Final Email with the Navy Header
-    html_template = f"""
-    <div style="font-family: 'Helvetica Neue', Helvetica, Arial, sans-serif; background-color: #f3f4f6; padding: 20px;">
-        <div style="max-width: 600px; margin: 0 auto;">
-            
-            <div style="background-color: #111827; color: #ffffff; padding: 25px; text-align: center; border-radius: 8px; margin-bottom: 25px; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
-                <h1 style="margin: 0; font-size: 26px; font-weight: bold;">Naxera AI</h1>
-                <p style="margin: 5px 0 0 0; opacity: 0.8; font-size: 14px;">Daily Portfolio Wrap</p>
-                
-                <div style="margin-top: 20px; padding-top: 20px; border-top: 1px solid #374151;">
-                    <span style="font-size: 12px; font-weight: bold; letter-spacing: 1px; color: #9ca3af;">TOTAL VALUE</span><br/>
-                    <span style="font-size: 40px; font-weight: bold; color: #4ade80;">${total_value:,.2f}</span>
-                </div>
-            </div>
-            
-            {cards_html}
-            
-            <div style="text-align: center; font-size: 12px; color: #6b7280; margin-top: 30px; padding: 20px; border-top: 1px solid #d1d5db;">
-                Generated by Naxera AI • Goldman Sachs Analysis Logic
-                <br><br>
-                <a href="{manage_url}" style="color: #9ca3af; text-decoration: underline;">Manage Portfolio or Unsubscribe</a>
-            </div>
-        </div>
-    </div>
-    """
+    # Card bodies are shared by every holder of a ticker; only the holding header is per user
+    html_template = render_report(
+        portfolio_data, analyses, total_value, manage_url,
+        fragments=_resource(config, "fragments"), risk=state.get("risk"),
+    )
     
     return {"final_report": html_template}
 
 # --- NODE 4: PUBLISHER ---
-def publisher_node(state: AgentState):
+def publisher_node(state: AgentState, config: RunnableConfig):
     report = state["final_report"]
     recipient = state["user_email"]
-    charts = state.get("chart_paths", [])
+    chart_cache = _resource(config, "charts")
+    if chart_cache is not None:
+        charts = chart_cache.attachments([s["ticker"] for s in state.get("portfolio_data", [])])
+    else:
+        charts = state.get("charts", [])
     total_val = state.get("total_value", 0)
     
     print(f"📧 Sending Portfolio Wrap to {recipient} with {len(charts)} charts...")
     
-    send_email(
-        to=recipient, 
-        subject=f"Market Wrap: Your ${total_val:,.2f} Portfolio", 
-        body=report,
-        attachments=charts 
-    )
+    subject = f"Market Wrap: Your ${total_val:,.2f} Portfolio"
+    outbox = _resource(config, "outbox")
+    if outbox is not None:
+        # Queued; the outbox batches, retries and never double-sends on a re-run
+        outbox.enqueue(recipient, subject, report, attachments=charts)
+    else:
+        send_email(
+            to=recipient, 
+            subject=subject, 
+            body=report,
+            attachments=charts 
+        )
     
-    # Cleanup all charts
-    for chart in charts:
-        if os.path.exists(chart):
-            os.remove(chart)
-            
     return {"final_report": report}
 
 # --- LOGIC & GRAPH ---
-def build_graph():
+def build_graph(checkpointer=None):
+    # LangGraph is only loaded once a graph is actually needed
+    from langgraph.graph import StateGraph, END
+
     workflow = StateGraph(AgentState)
-    workflow.add_node("researcher", search_node)
-    workflow.add_node("data_collector", data_collection_node)
-    workflow.add_node("analyst", analyze_node)
-    workflow.add_node("publisher", publisher_node)
+    workflow.add_node("researcher", traced("node.researcher")(search_node))
+    workflow.add_node("data_collector", traced("node.data_collector")(data_collection_node))
+    workflow.add_node("analyst", traced("node.analyst")(analyze_node))
+    workflow.add_node("publisher", traced("node.publisher")(publisher_node))
 
     workflow.set_entry_point("researcher")
     workflow.add_edge("researcher", "data_collector")
@@ -288,9 +186,39 @@ def build_graph():
     workflow.add_edge("analyst", "publisher")
     workflow.add_edge("publisher", END)
 
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
+
+@lru_cache(maxsize=4)
+def get_app(checkpointer=None):
+    """The compiled graph is stateless, so one instance (per checkpointer) serves every user in the run."""
+    return build_graph(checkpointer)
 
-def run_agent(inputs: dict):
-    app = build_graph()
-    result = app.invoke(inputs)
+def run_agent(inputs: dict, checkpoints=None, **resources):
+    """
+    Runs one user's graph. Keyword arguments are run-scoped resources shared by
+    every user (market_data, news, charts, analysis_cache, rate_limiter,
+    fragments, outbox), handed to the nodes via the config.
+
+    With `checkpoints` (a RunCheckpoints), progress is saved after every node:
+    a user who failed earlier today resumes at the node that failed, and one
+    whose graph finished but whose email was never delivered gets only the
+    publisher re-run.
+    """
+    if checkpoints is None:
+        result = get_app().invoke(inputs, config={"configurable": resources})
+        return result["final_report"]
+
+    app = get_app(checkpoints.saver)
+    email = inputs["user_email"]
+    config = checkpoints.config(email, **resources)
+    progress = checkpoints.progress(app, email)
+    if progress is None:
+        result = app.invoke(inputs, config=config)
+    else:
+        if progress:
+            print(f"⏯️ Resuming {email} at {', '.join(progress)}")
+        else:
+            print(f"⏯️ Re-publishing the finished report for {email}")
+            app.update_state(config, None, as_node="analyst")
+        result = app.invoke(None, config=config)
     return result["final_report"]
\ No newline at end of file
@@ -0,0 +1,357 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+
+from src.llm_cache import AnalysisCache
+from src.tracing import tracer
+
+REQUIRED_FIELDS = ("quant_analysis", "summary", "verdict", "rationale")
+
+# Groq free-tier quotas for llama-3.3-70b; override per account
+GROQ_RPM = int(os.getenv("GROQ_RPM", "30"))
+GROQ_TPM = int(os.getenv("GROQ_TPM", "12000"))
+GROQ_CONCURRENCY = int(os.getenv("GROQ_CONCURRENCY", "4"))
+# >1 asks for several tickers per completion (JSON array); 1 keeps one call per ticker
+GROQ_TICKERS_PER_CALL = int(os.getenv("GROQ_TICKERS_PER_CALL", "1"))
+
+# Rough completion size of one analysis, used to reserve TPM budget up front
+COMPLETION_TOKENS_PER_TICKER = 600
+
+
+# --- PROMPTS ---
+def _stock_line(stock: dict):
+    quant = stock['quant']
+    line = (
+        f"Financials: Price ${stock['price']}, PE {stock['pe_ratio']}\n"
+        f"    Technical Indicators: 50-Day SMA: {quant['sma_50']}, 200-Day SMA: {quant['sma_200']}, "
+        f"RSI (14-day): {quant['rsi']}."
+    )
+    if stock.get('news'):
+        line += f"\n    Ticker News: {stock['news']}"
+    return line
+
+
+def build_prompt(stock: dict, news_content: str):
+    # NEW PROMPT: Force the AI to format JSON safely
+    return f"""
+    You are a Senior Quantitative Investment Analyst at Goldman Sachs.
+    Ticker: {stock['ticker']}
+    Broad Market News: {news_content}
+    {_stock_line(stock)}
+
+    Output a valid JSON object with exactly 4 fields.
+    CRITICAL RULES FOR JSON:
+    - Use the literal characters \\n for paragraph breaks. Do NOT use actual line breaks inside the string values.
+    - Do NOT use double quotes inside your text (use single quotes ' instead).
+
+    1. "quant_analysis": A lengthy, in-depth 2-to-3 paragraph technical and quantitative analysis. Discuss the moving averages (trend), the RSI (momentum), and what this means for institutional buyers.
+    2. "summary": A concise 3-sentence executive summary.
+    3. "verdict": A single word: "Buy", "Sell", or "Hold".
+    4. "rationale": A 1-sentence explanation of the verdict.
+
+    Return ONLY the JSON string.
+    """
+
+
+def build_batch_prompt(stocks: list, news_content: str):
+    holdings = "\n".join(f"    - Ticker: {s['ticker']}\n    {_stock_line(s)}" for s in stocks)
+    return f"""
+    You are a Senior Quantitative Investment Analyst at Goldman Sachs.
+    Broad Market News: {news_content}
+    Analyze each of these {len(stocks)} stocks independently:
+{holdings}
+
+    Output a valid JSON array with one object per stock, in the same order. Each object has exactly 5 fields.
+    CRITICAL RULES FOR JSON:
+    - Use the literal characters \\n for paragraph breaks. Do NOT use actual line breaks inside the string values.
+    - Do NOT use double quotes inside your text (use single quotes ' instead).
+
+    1. "ticker": The ticker symbol exactly as given above.
+    2. "quant_analysis": A lengthy, in-depth 2-to-3 paragraph technical and quantitative analysis. Discuss the moving averages (trend), the RSI (momentum), and what this means for institutional buyers.
+    3. "summary": A concise 3-sentence executive summary.
+    4. "verdict": A single word: "Buy", "Sell", or "Hold".
+    5. "rationale": A 1-sentence explanation of the verdict.
+
+    Return ONLY the JSON array.
+    """
+
+
+# --- PARSING ---
+def fallback_analysis():
+    return {
+        "quant_analysis": "Quantitative data currently processing.",
+        "summary": "Analysis data temporarily unavailable.",
+        "verdict": "Hold",
+        "rationale": "Pending manual review."
+    }
+
+
+def is_valid_analysis(analysis):
+    return (
+        isinstance(analysis, dict)
+        and all(isinstance(analysis.get(f), str) and analysis[f].strip() for f in REQUIRED_FIELDS)
+        and analysis["verdict"].strip().upper() in ("BUY", "SELL", "HOLD")
+    )
+
+
+def _load_json(raw_response: str):
+    cleaned_response = raw_response.replace("```json", "").replace("```", "").strip()
+    # NEW: strict=False tells Python to forgive accidental line breaks!
+    return json.loads(cleaned_response, strict=False)
+
+
+def parse_analysis(ticker: str, raw_response: str):
+    """Returns (analysis, parsed_ok); a bad response falls back to a neutral Hold."""
+    try:
+        analysis = _load_json(raw_response)
+        if not is_valid_analysis(analysis):
+            raise ValueError("missing or invalid fields")
+        return analysis, True
+    except Exception as e:
+        print(f"⚠️ JSON Parse Error for {ticker}: {e}")
+        return fallback_analysis(), False
+
+
+def parse_batch(tickers: list, raw_response: str):
+    """Validates a JSON array answer element by element; returns {ticker: analysis} for the good ones."""
+    try:
+        elements = _load_json(raw_response)
+    except Exception as e:
+        print(f"⚠️ JSON Parse Error for batch {', '.join(tickers)}: {e}")
+        return {}
+    if not isinstance(elements, list):
+        return {}
+
+    wanted = {t.upper(): t for t in tickers}
+    analyses = {}
+    for element in elements:
+        if not isinstance(element, dict):
+            continue
+        ticker = wanted.get(str(element.get("ticker", "")).strip().upper())
+        if ticker and is_valid_analysis(element):
+            analyses[ticker] = {f: element[f] for f in REQUIRED_FIELDS}
+    return analyses
+
+
+# --- RATE LIMITING ---
+class RateLimiter:
+    """
+    Token-bucket limiter for Groq's requests-per-minute and tokens-per-minute
+    quotas. Thread-safe, so one instance can be shared by every user in a run.
+    """
+
+    def __init__(self, rpm: int = GROQ_RPM, tpm: int = GROQ_TPM):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: int):
+        """Takes budget if available and returns 0, otherwise returns seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated
+            self._updated = now
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+            tokens = min(tokens, self.tpm)  # A huge prompt must still be able to go out
+            if self._requests >= 1 and self._tokens >= tokens:
+                self._requests -= 1
+                self._tokens -= tokens
+                return 0.0
+            return max(
+                (1 - self._requests) * 60 / self.rpm,
+                (tokens - self._tokens) * 60 / self.tpm,
+            )
+
+    async def acquire(self, tokens: int):
+        while True:
+            wait = self._reserve(tokens)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+_shared_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def shared_limiter():
+    """The process-wide limiter; quotas belong to the API key, not to one user."""
+    global _shared_limiter
+    with _limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter()
+        return _shared_limiter
+
+
+def _estimate_tokens(prompt: str, n_tickers: int = 1):
+    return len(prompt) // 4 + COMPLETION_TOKENS_PER_TICKER * n_tickers
+
+
+def _retry_after(error):
+    """Seconds to wait if `error` is a rate-limit (HTTP 429) response, else None."""
+    if getattr(error, "status_code", None) != 429:
+        return None
+    response = getattr(error, "response", None)
+    header = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(header)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+# --- EVENT LOOP ---
+# All async LLM traffic goes through one background loop, so the shared limiter
+# and the client's connection pool live on a single loop even when several user
+# graphs call the analyst from different threads.
+_loop = None
+_loop_lock = threading.Lock()
+
+
+# Completions currently being generated, by cache key. Only touched from the
+# loop thread, so users asking for the same prompt at the same time share one
+# request instead of all missing the cache together.
+_in_flight = {}
+
+
+def run_sync(coro):
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="analyst-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result()
+
+
+# --- ANALYST ---
+class Analyst:
+    """
+    Runs every analysis a report needs concurrently through llm.ainvoke.
+
+    Cached answers are reused (keyed by the single-ticker prompt, in both modes).
+    With tickers_per_call > 1, misses are grouped into multi-ticker prompts; any
+    element of the returned array that fails validation is retried on its own.
+    """
+
+    def __init__(self, llm, model: str, temperature: float, cache: AnalysisCache = None,
+                 limiter: RateLimiter = None, concurrency: int = GROQ_CONCURRENCY,
+                 tickers_per_call: int = GROQ_TICKERS_PER_CALL, max_retries: int = 4):
+        self.llm = llm
+        self.model = model
+        self.temperature = temperature
+        self.cache = cache
+        self.limiter = limiter or shared_limiter()
+        self.concurrency = concurrency
+        self.tickers_per_call = max(1, tickers_per_call)
+        self.max_retries = max_retries
+
+    async def _invoke(self, prompt: str, n_tickers: int, semaphore):
+        from langchain_core.messages import HumanMessage
+
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self.limiter.acquire(_estimate_tokens(prompt, n_tickers))
+                try:
+                    with tracer.span("groq.invoke", tickers=n_tickers, attempt=attempt):
+                        response = await self.llm.ainvoke([HumanMessage(content=prompt)])
+                    tracer.add_tokens("groq", getattr(response, "usage_metadata", None))
+                    return response.content
+                except Exception as e:
+                    wait = _retry_after(e)
+                    if wait is None or attempt == self.max_retries:
+                        raise
+                    tracer.count("groq.retry")
+                    wait = max(wait, 2 ** attempt) + random.uniform(0, 1)
+                    print(f"⏳ Groq rate limit hit, backing off {wait:.1f}s...")
+                    await asyncio.sleep(wait)
+
+    async def _analyze_one(self, stock: dict, prompt: str, semaphore):
+        ticker = stock['ticker']
+        try:
+            raw_response = await self._invoke(prompt, 1, semaphore)
+        except Exception as e:
+            print(f"❌ Analysis failed for {ticker}: {e}")
+            return fallback_analysis(), False
+        return parse_analysis(ticker, raw_response)
+
+    async def _analyze_batch(self, stocks: list, news_content: str, semaphore):
+        tickers = [s['ticker'] for s in stocks]
+        try:
+            raw_response = await self._invoke(build_batch_prompt(stocks, news_content), len(stocks), semaphore)
+            return parse_batch(tickers, raw_response)
+        except Exception as e:
+            print(f"❌ Batch analysis failed for {', '.join(tickers)}: {e}")
+            return {}
+
+    async def analyze(self, stocks: list, news_content: str):
+        """Returns {ticker: analysis} for every stock (fallback Hold where all attempts failed)."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        prompts = {s['ticker']: build_prompt(s, news_content) for s in stocks}
+        keys = {t: AnalysisCache.key(self.model, self.temperature, p) for t, p in prompts.items()}
+
+        results = {}
+        for stock in stocks:
+            cached = self.cache.get(keys[stock['ticker']]) if self.cache else None
+            if cached is not None:
+                results[stock['ticker']] = cached
+
+        # Misses another user is already asking for are awaited, not re-requested
+        waiting = {}
+        owned = {}
+        for stock in stocks:
+            ticker = stock['ticker']
+            if ticker in results or ticker in waiting or ticker in owned:
+                continue
+            if keys[ticker] in _in_flight:
+                waiting[ticker] = _in_flight[keys[ticker]]
+                tracer.count("analysis.coalesced")
+            else:
+                owned[ticker] = _in_flight[keys[ticker]] = asyncio.get_running_loop().create_future()
+        misses = [s for s in stocks if s['ticker'] in owned]
+
+        def store(ticker, analysis):
+            results[ticker] = analysis
+            # Only real answers are cached, never the fallback
+            if self.cache:
+                self.cache.put(keys[ticker], analysis)
+            owned[ticker].set_result((analysis, True))
+
+        try:
+            await self._request(misses, prompts, news_content, semaphore, results, store)
+        finally:
+            for ticker, future in owned.items():
+                if not future.done():
+                    future.set_result((results.get(ticker) or fallback_analysis(), False))
+                _in_flight.pop(keys[ticker], None)
+
+        for ticker, future in waiting.items():
+            results[ticker], _ = await asyncio.shield(future)
+        return results
+
+    async def _request(self, misses: list, prompts: dict, news_content: str, semaphore, results: dict, store):
+        """Asks the LLM for every miss; good answers go through `store`, fallbacks only into `results`."""
+        if self.tickers_per_call > 1 and len(misses) > 1:
+            chunks = [misses[i:i + self.tickers_per_call] for i in range(0, len(misses), self.tickers_per_call)]
+            # A lone leftover ticker just uses the regular single prompt below
+            chunks = [c for c in chunks if len(c) > 1]
+            for answers in await asyncio.gather(*(self._analyze_batch(c, news_content, semaphore) for c in chunks)):
+                for ticker, analysis in answers.items():
+                    store(ticker, analysis)
+            misses = [s for s in misses if s['ticker'] not in results]
+
+        singles = await asyncio.gather(*(self._analyze_one(s, prompts[s['ticker']], semaphore) for s in misses))
+        for stock, (analysis, parsed) in zip(misses, singles):
+            if parsed:
+                store(stock['ticker'], analysis)
+            else:
+                results[stock['ticker']] = analysis
+
+    def run(self, stocks: list, news_content: str):
+        return run_sync(self.analyze(stocks, news_content))
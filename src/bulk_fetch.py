@@ -0,0 +1,82 @@
+import time
+
+from src.tracing import tracer
+
+DEFAULT_BATCH_SIZE = 100
+
+
+def _split_frame(raw, batch):
+    """
+    Splits one multi-symbol yf.download frame into a clean OHLCV frame per ticker.
+    Tickers that came back empty (or all NaN) are left out so they can be retried.
+    """
+    frames = {}
+    if raw is None or raw.empty:
+        return frames
+
+    for ticker in batch:
+        if raw.columns.nlevels > 1:
+            if ticker not in raw.columns.get_level_values(0):
+                continue
+            frame = raw[ticker]
+        else:
+            # Older yfinance returns flat columns for a single symbol
+            frame = raw
+
+        # Different exchanges trade on different days; drop the alignment gaps
+        frame = frame.dropna(how="all")
+        if not frame.empty:
+            frames[ticker] = frame
+    return frames
+
+
+def download_bars(tickers, period: str = None, interval: str = "1d", batch_size: int = DEFAULT_BATCH_SIZE,
+                  retries: int = 2, backoff: float = 2.0, start=None):
+    """
+    Downloads price bars for many tickers with a few multi-symbol requests.
+
+    Pass either a `period` ("1y") or a `start` date for incremental updates.
+    Tickers are sent to Yahoo in batches of `batch_size`. Symbols missing from a
+    batch response are retried on their own batch up to `retries` more times with
+    exponential backoff. Returns ({ticker: DataFrame}, number of requests made); a
+    ticker that never came back maps to an empty DataFrame, like an empty history().
+    """
+    import pandas as pd
+    import yfinance as yf
+
+    pending = list(dict.fromkeys(tickers))
+    results = {}
+    requests = 0
+
+    for attempt in range(retries + 1):
+        if not pending:
+            break
+        if attempt:
+            wait = backoff * 2 ** (attempt - 1)
+            tracer.count("yf.download.retry")
+            print(f"🔁 Retrying {len(pending)} tickers ({period or start}/{interval}) in {wait:.0f}s...")
+            time.sleep(wait)
+
+        for offset in range(0, len(pending), batch_size):
+            batch = pending[offset:offset + batch_size]
+            requests += 1
+            try:
+                window = {"start": start} if start is not None else {"period": period}
+                with tracer.span("yf.download", tickers=len(batch), interval=interval):
+                    raw = yf.download(
+                        batch, interval=interval, group_by="ticker",
+                        auto_adjust=True, threads=True, progress=False, **window,
+                    )
+            except Exception as e:
+                print(f"⚠️ Batch download failed ({len(batch)} tickers): {e}")
+                continue
+            results.update(_split_frame(raw, batch))
+
+        pending = [t for t in pending if t not in results]
+
+    if pending:
+        print(f"⚠️ No {interval} bars for: {', '.join(pending)}")
+    for ticker in pending:
+        results[ticker] = pd.DataFrame()
+
+    return results, requests
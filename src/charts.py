@@ -0,0 +1,83 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.tools import encode_attachment, generate_stock_chart
+from src.tracing import tracer
+
+
+def _render(job):
+    """Process-pool worker: renders one ticker and times it."""
+    ticker, hist = job
+    started = time.perf_counter()
+    png = generate_stock_chart(ticker, hist=hist)
+    return ticker, png, time.perf_counter() - started
+
+
+def _pool_context():
+    """
+    Workers are started from a clean server process (or spawned where that is
+    unavailable) rather than forked: by the time charts render, the analyst's
+    event-loop thread may hold locks a forked child would inherit mid-use.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+class ChartCache:
+    """
+    Run-level chart store. Each unique ticker is rendered once, in parallel
+    across cores, and every email that holds it attaches the same image.
+    """
+
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers or int(os.getenv("NAXERA_CHART_WORKERS", "0")) or os.cpu_count()
+        self.render_times = {}
+        self._charts = {}
+
+    def render(self, tickers, fetch_intraday):
+        """Renders every ticker's 24h chart from fetch_intraday(ticker) bars."""
+        jobs = []
+        for ticker in sorted(set(tickers)):
+            try:
+                hist = fetch_intraday(ticker)
+            except Exception as e:
+                print(f"❌ Failed to fetch intraday bars for {ticker}: {e}")
+                continue
+            if hist is not None and not hist.empty:
+                # Only ship the columns the chart uses to the workers
+                jobs.append((ticker, hist[["Open", "Close"]]))
+
+        print(f"📈 Rendering {len(jobs)} charts on {self.max_workers} processes...")
+        if self.max_workers > 1 and len(jobs) > 1:
+            workers = min(self.max_workers, len(jobs))
+            with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as pool:
+                results = list(pool.map(_render, jobs))
+        else:
+            results = [_render(job) for job in jobs]
+
+        for ticker, png, seconds in results:
+            self.render_times[ticker] = seconds
+            tracer.observe("chart.render", seconds * 1000, ticker=ticker)
+            if png:
+                self._charts[ticker.upper()] = encode_attachment(png)
+        return self
+
+    def attachments(self, tickers):
+        """Attachment dicts for whichever of `tickers` have a chart."""
+        charts = []
+        for ticker in dict.fromkeys(tickers):
+            content = self._charts.get(ticker.upper())
+            if content:
+                charts.append({"filename": f"{ticker}_chart.png", "content": content})
+        return charts
+
+    def stats(self):
+        times = list(self.render_times.values())
+        return {
+            "charts": len(self._charts),
+            "total_render_s": round(sum(times), 3),
+            "mean_render_s": round(sum(times) / len(times), 3) if times else 0.0,
+            "max_render_s": round(max(times), 3) if times else 0.0,
+        }
@@ -0,0 +1,55 @@
+import sqlite3
+from datetime import date, timedelta
+
+from src.sharding import email_digest
+from src.storage import data_path
+
+
+class RunCheckpoints:
+    """
+    Durable per-user progress for one run date, kept as LangGraph checkpoints in
+    the data directory.
+
+    Every user gets one thread per run date. After each node the graph state is
+    saved, so a re-run of the same date can skip users whose graph finished and
+    pick failed users up at the node that did not complete, reusing everything
+    the earlier nodes already fetched and generated.
+    """
+
+    def __init__(self, path: str = None, run_date: str = None, keep_days: int = 3):
+        from langgraph.checkpoint.sqlite import SqliteSaver
+
+        self.path = path or data_path("checkpoints.sqlite")
+        self.run_date = run_date or date.today().isoformat()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.saver = SqliteSaver(self._conn)
+        self.saver.setup()
+        self.prune(keep_days)
+
+    def thread_id(self, email: str):
+        return f"{self.run_date}/{email_digest(email)}"
+
+    def config(self, email: str, **resources):
+        return {"configurable": {"thread_id": self.thread_id(email), **resources}}
+
+    def progress(self, app, email: str):
+        """None if the user has not started today, () once their graph finished, else the nodes still to run."""
+        snapshot = app.get_state(self.config(email))
+        if not snapshot.values:
+            return None
+        return tuple(snapshot.next)
+
+    def prune(self, keep_days: int):
+        """Drops the threads of run dates older than `keep_days` days."""
+        cutoff = (date.fromisoformat(self.run_date) - timedelta(days=keep_days)).isoformat()
+        stale = [
+            row[0] for row in
+            self._conn.execute("SELECT DISTINCT thread_id FROM checkpoints WHERE thread_id < ?", (cutoff,))
+        ]
+        for thread_id in stale:
+            self.saver.delete_thread(thread_id)
+        if stale:
+            print(f"🧹 Pruned checkpoints of {len(stale)} users from before {cutoff}")
+
+    def close(self):
+        self._conn.close()
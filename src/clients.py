@@ -0,0 +1,31 @@
+import os
+from functools import lru_cache
+
+# Groq model used by the analyst (also part of the analysis cache key)
+MODEL_NAME = "llama-3.3-70b-versatile"
+TEMPERATURE = 0
+
+# API clients are built on first use, not at import time: importing the package
+# (tests, the bench, CLI helpers) stays cheap and needs no API keys, and every
+# caller in the process shares one client.
+
+
+@lru_cache(maxsize=1)
+def get_llm():
+    from langchain_groq import ChatGroq
+
+    return ChatGroq(model=MODEL_NAME, temperature=TEMPERATURE, api_key=os.getenv("GROQ_API_KEY"))
+
+
+@lru_cache(maxsize=1)
+def get_tavily():
+    from tavily import TavilyClient
+
+    return TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+
+
+@lru_cache(maxsize=1)
+def get_supabase():
+    from supabase import create_client
+
+    return create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_KEY"))
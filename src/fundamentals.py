@@ -0,0 +1,203 @@
+import json
+import math
+import sqlite3
+import threading
+import time
+
+from src.storage import data_path
+from src.tracing import tracer
+
+# Which Yahoo `.info` keys we keep, grouped by how quickly they go stale.
+# The live price comes from the cheap quote endpoint instead; P/E and market
+# cap are derived from it, so they stay current between estimate refreshes.
+FIELD_CLASSES = {
+    "estimates": ("trailingEps", "sharesOutstanding", "trailingPE", "marketCap", "targetMeanPrice", "recommendationKey"),
+    "profile": ("longBusinessSummary",),
+}
+
+# Seconds each class stays fresh; "quote" is the live price
+DEFAULT_TTLS = {
+    "quote": 15 * 60,
+    "estimates": 3 * 24 * 3600,
+    "profile": 30 * 24 * 3600,
+}
+
+# Unknown or delisted symbols are not retried for this long
+NEGATIVE_TTL = 24 * 3600
+
+SUMMARY_CHARS = 500
+
+
+class InvalidSymbol(Exception):
+    pass
+
+
+class FundamentalsCache:
+    """Per-ticker fundamentals on disk, one row per field class, plus negative entries for bad symbols."""
+
+    def __init__(self, path: str = None):
+        self.path = path or data_path("fundamentals.sqlite")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS fundamentals ("
+            "ticker TEXT NOT NULL, kind TEXT NOT NULL, data TEXT NOT NULL, fetched_at REAL NOT NULL, "
+            "PRIMARY KEY (ticker, kind))"
+        )
+        self._conn.commit()
+
+    def get(self, ticker: str):
+        """{kind: (data, fetched_at)} for everything stored about `ticker`."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT kind, data, fetched_at FROM fundamentals WHERE ticker = ?", (ticker,)
+            ).fetchall()
+        return {kind: (json.loads(data), fetched_at) for kind, data, fetched_at in rows}
+
+    def put(self, ticker: str, entries: dict, fetched_at: float = None):
+        """Stores {kind: data}; an "invalid" entry marks the symbol as unknown to Yahoo."""
+        fetched_at = fetched_at or time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO fundamentals VALUES (?, ?, ?, ?)",
+                [(ticker, kind, json.dumps(data), fetched_at) for kind, data in entries.items()],
+            )
+            if "invalid" not in entries:
+                self._conn.execute("DELETE FROM fundamentals WHERE ticker = ? AND kind = 'invalid'", (ticker,))
+            self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+def _number(value):
+    if value is None:
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+def _fetch_info(ticker: str):
+    import yfinance as yf
+
+    try:
+        with tracer.span("yf.info", ticker=ticker):
+            info = yf.Ticker(ticker).info
+    except Exception as e:
+        if "404" in str(e) or "not found" in str(e).lower():
+            raise InvalidSymbol(str(e))
+        raise
+    price = _number(info.get("currentPrice")) or _number(info.get("regularMarketPrice"))
+    if not info or (price is None and info.get("quoteType") is None):
+        raise InvalidSymbol(f"no quote data for {ticker}")
+    return info, price
+
+
+def _fetch_quote(ticker: str):
+    import yfinance as yf
+
+    with tracer.span("yf.quote", ticker=ticker):
+        return _number(yf.Ticker(ticker).fast_info["lastPrice"])
+
+
+class Fundamentals:
+    """
+    Drop-in, cached replacement for tools.get_financial_metrics.
+
+    Each field class is refreshed only once its TTL has passed: the price
+    comes from the lightweight quote endpoint every run, while the slow
+    `.info` call only happens when estimates or the business summary are
+    stale. Symbols Yahoo does not know are remembered for `negative_ttl`, and
+    if a refresh fails the last stored values are served instead.
+    """
+
+    def __init__(self, cache: FundamentalsCache = None, ttls: dict = None, negative_ttl: float = NEGATIVE_TTL):
+        self.cache = cache or FundamentalsCache()
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.negative_ttl = negative_ttl
+        self.info_calls = 0
+        self.quote_calls = 0
+        self.invalid = 0
+        self._lock = threading.Lock()
+
+    def _stale(self, stored: dict, kind: str, now: float):
+        return kind not in stored or now - stored[kind][1] > self.ttls[kind]
+
+    def _refresh(self, ticker: str, stored: dict, now: float):
+        """Fetches whatever is stale and returns the updated {kind: (data, fetched_at)}."""
+        entries = {}
+        if any(self._stale(stored, kind, now) for kind in FIELD_CLASSES):
+            with self._lock:
+                self.info_calls += 1
+            info, price = _fetch_info(ticker)
+            for kind, keys in FIELD_CLASSES.items():
+                entries[kind] = {key: info.get(key) for key in keys}
+            entries["quote"] = {"price": price}
+        elif self._stale(stored, "quote", now):
+            with self._lock:
+                self.quote_calls += 1
+            price = _fetch_quote(ticker)
+            if price is not None:
+                entries["quote"] = {"price": price}
+        if entries:
+            self.cache.put(ticker, entries, now)
+        return {**stored, **{kind: (data, now) for kind, data in entries.items()}}
+
+    def metrics(self, ticker: str):
+        ticker = ticker.upper()
+        now = time.time()
+        stored = self.cache.get(ticker)
+
+        if "invalid" in stored:
+            if now - stored.pop("invalid")[1] < self.negative_ttl:
+                tracer.count("cache.fundamentals.negative")
+                return {}
+
+        fresh = not any(self._stale(stored, kind, now) for kind in self.ttls)
+        tracer.count("cache.fundamentals.hit" if fresh else "cache.fundamentals.miss")
+        if not fresh:
+            try:
+                stored = self._refresh(ticker, stored, now)
+            except InvalidSymbol as e:
+                print(f"⚠️ {ticker} looks invalid or delisted, skipping it for a day: {e}")
+                with self._lock:
+                    self.invalid += 1
+                self.cache.put(ticker, {"invalid": {"reason": str(e)}}, now)
+                return {}
+            except Exception as e:
+                if not stored:
+                    print(f"Error fetching data for {ticker}: {e}")
+                    return {}
+                print(f"⚠️ Using cached fundamentals for {ticker}: {e}")
+
+        return self._assemble({kind: data for kind, (data, _) in stored.items()})
+
+    @staticmethod
+    def _assemble(stored: dict):
+        estimates = stored.get("estimates", {})
+        price = stored.get("quote", {}).get("price")
+        eps = _number(estimates.get("trailingEps"))
+        shares = _number(estimates.get("sharesOutstanding"))
+
+        # Derive from the live price where possible; fall back to the stored snapshot
+        if price is not None and eps is not None:
+            pe_ratio = round(price / eps, 2) if eps > 0 else None
+        else:
+            pe_ratio = estimates.get("trailingPE")
+        market_cap = price * shares if price is not None and shares else estimates.get("marketCap")
+
+        summary = stored.get("profile", {}).get("longBusinessSummary")
+        return {
+            "current_price": price,
+            "market_cap": market_cap,
+            "pe_ratio": pe_ratio,
+            "target_mean_price": estimates.get("targetMeanPrice"),
+            "recommendation": estimates.get("recommendationKey"),
+            "company_summary": summary[:SUMMARY_CHARS] + "..." if summary else None,
+        }
+
+    def stats(self):
+        return {"info_calls": self.info_calls, "quote_calls": self.quote_calls, "invalid": self.invalid}
@@ -0,0 +1,252 @@
+import numpy as np
+import pandas as pd
+
+# Every indicator below works on a date x ticker matrix (one column per symbol),
+# so the cost is a handful of 2-D pandas operations regardless of universe size.
+
+
+def price_matrix(histories: dict, field: str = "Close"):
+    """Aligns {ticker: OHLCV DataFrame} into one date x ticker matrix for `field`."""
+    columns = {t: h[field] for t, h in histories.items() if h is not None and not h.empty}
+    if not columns:
+        return pd.DataFrame()
+    return pd.concat(columns, axis=1, sort=True)
+
+
+def align_bars(close, *others):
+    """
+    Re-indexes date x ticker matrices by each ticker's own bar position instead
+    of by date: the last row holds every ticker's latest bar, the row before
+    its previous bar, and so on. Tickers on different calendars (crypto,
+    foreign listings, a missing bar) then never see each other's dates as NaN
+    holes, so rolling windows count that ticker's bars only. `others` (e.g.
+    high/low) are moved cell for cell with `close`.
+    """
+    values = close.to_numpy(dtype=float)
+    traded = ~np.isnan(values)
+    counts = traded.sum(axis=0)
+    length = int(counts.max()) if counts.size else 0
+    src_rows, cols = np.nonzero(traded)
+    dest_rows = (length - counts + traded.cumsum(axis=0) - 1)[src_rows, cols]
+
+    aligned = []
+    for frame in (close, *others):
+        source = frame.to_numpy(dtype=float)
+        out = np.full((length, values.shape[1]), np.nan)
+        out[dest_rows, cols] = source[src_rows, cols]
+        aligned.append(pd.DataFrame(out, columns=close.columns))
+    return aligned
+
+
+def sma(close, window: int):
+    return close.rolling(window=window).mean()
+
+
+def ema(close, span: int):
+    return close.ewm(span=span, adjust=False, min_periods=span).mean()
+
+
+def _wilder_smooth(values, period: int):
+    """
+    Wilder's smoothing: the first average is a plain mean of `period` values,
+    every later one is prev + (value - prev) / period.
+    """
+    seed_mean = values.rolling(window=period).mean()
+    started = seed_mean.notna().cummax()
+    seed = started & ~started.shift(fill_value=False)
+    seeded = values.where(started).mask(seed, seed_mean)
+    return seeded.ewm(alpha=1 / period, adjust=False, ignore_na=True).mean().where(started)
+
+
+def wilder_rsi(close, period: int = 14):
+    delta = close.diff()
+    avg_gain = _wilder_smooth(delta.clip(lower=0), period)
+    avg_loss = _wilder_smooth(-delta.clip(upper=0), period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg_gain / avg_loss
+    # avg_loss == 0 gives rs = inf, i.e. an RSI of 100
+    return 100 - (100 / (1 + rs))
+
+
+def macd(close, fast: int = 12, slow: int = 26, signal: int = 9):
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = line.ewm(span=signal, adjust=False, min_periods=signal).mean()
+    return line, signal_line, line - signal_line
+
+
+def bollinger(close, window: int = 20, num_std: float = 2.0):
+    mid = sma(close, window)
+    std = close.rolling(window=window).std(ddof=0)
+    return mid + num_std * std, mid, mid - num_std * std
+
+
+def atr(high, low, close, period: int = 14):
+    prev_close = close.shift()
+    true_range = np.fmax(high - low, np.fmax((high - prev_close).abs(), (low - prev_close).abs()))
+    return _wilder_smooth(true_range, period)
+
+
+def compute_indicators(close, high=None, low=None):
+    """
+    Computes every indicator for all tickers in one pass.
+
+    `close`, `high` and `low` are date x ticker matrices (see price_matrix()),
+    re-aligned by bar position first (see align_bars()), so a ticker's numbers
+    do not depend on which other tickers are in the matrix. ATR is skipped when
+    high/low are not given. Returns {ticker: record} with the latest value of
+    each indicator as a float, or None if there is not enough history yet
+    (e.g. sma_200 for a stock with fewer than 200 bars).
+    """
+    if close.empty:
+        return {}
+    has_range = high is not None and low is not None
+    if has_range:
+        close, high, low = align_bars(close, high.reindex_like(close), low.reindex_like(close))
+    else:
+        close, = align_bars(close)
+
+    macd_line, macd_signal, macd_hist = macd(close)
+    bb_upper, bb_mid, bb_lower = bollinger(close)
+    frames = {
+        "close": close,
+        "sma_50": sma(close, 50),
+        "sma_200": sma(close, 200),
+        "ema_20": ema(close, 20),
+        "rsi_14": wilder_rsi(close, 14),
+        "macd": macd_line,
+        "macd_signal": macd_signal,
+        "macd_hist": macd_hist,
+        "bb_upper": bb_upper,
+        "bb_mid": bb_mid,
+        "bb_lower": bb_lower,
+    }
+    if has_range:
+        frames["atr_14"] = atr(high, low, close, 14)
+
+    # After alignment the last row is every ticker's latest bar
+    latest = {name: frame.iloc[-1] for name, frame in frames.items()}
+
+    records = {}
+    for ticker in close.columns:
+        records[ticker] = {
+            name: (None if pd.isna(values[ticker]) else float(values[ticker]))
+            for name, values in latest.items()
+        }
+    return records
+
+
+# --- Incremental state ---
+# The batch functions above recompute whole windows. The classes below hold
+# just enough state to fold in one new value in O(1), give the same numbers
+# as their batch counterparts, and round-trip through to_dict()/from_dict()
+# as plain JSON, so a long-running process can persist and resume them.
+
+class SMAState:
+    """Simple moving average over the last `window` values (matches sma())."""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.buffer = []  # ring buffer of the last `window` values
+        self.pos = 0
+        self.total = 0.0
+        self.value = None
+
+    def update(self, x: float):
+        x = float(x)
+        if len(self.buffer) < self.window:
+            self.buffer.append(x)
+            self.total += x
+        else:
+            self.total += x - self.buffer[self.pos]
+            self.buffer[self.pos] = x
+            self.pos = (self.pos + 1) % self.window
+            if self.pos == 0:
+                # Re-sum once per lap so floating-point drift can't build up
+                self.total = float(sum(self.buffer))
+        if len(self.buffer) == self.window:
+            self.value = self.total / self.window
+        return self.value
+
+    def to_dict(self):
+        return {"window": self.window, "buffer": list(self.buffer), "pos": self.pos, "total": self.total,
+                "value": self.value}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        state = cls(data["window"])
+        state.buffer, state.pos, state.total, state.value = list(data["buffer"]), data["pos"], data["total"], data["value"]
+        return state
+
+
+class EMAState:
+    """Exponential moving average seeded with the first value (matches ema())."""
+
+    def __init__(self, span: int):
+        self.span = span
+        self.alpha = 2 / (span + 1)
+        self.count = 0
+        self.mean = None
+        self.value = None
+
+    def update(self, x: float):
+        x = float(x)
+        self.mean = x if self.mean is None else self.mean + self.alpha * (x - self.mean)
+        self.count += 1
+        if self.count >= self.span:
+            self.value = self.mean
+        return self.value
+
+    def to_dict(self):
+        return {"span": self.span, "count": self.count, "mean": self.mean, "value": self.value}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        state = cls(data["span"])
+        state.count, state.mean, state.value = data["count"], data["mean"], data["value"]
+        return state
+
+
+class WilderRSIState:
+    """Wilder's RSI: simple-mean seed over `period` changes, then Wilder smoothing (matches wilder_rsi())."""
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.prev = None
+        self.count = 0  # price changes seen
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.value = None
+
+    def update(self, x: float):
+        x = float(x)
+        if self.prev is not None:
+            delta = x - self.prev
+            gain, loss = max(delta, 0.0), max(-delta, 0.0)
+            self.count += 1
+            if self.count <= self.period:
+                # Accumulate the seed; it becomes a plain mean on the period-th change
+                self.avg_gain += gain / self.period
+                self.avg_loss += loss / self.period
+            else:
+                self.avg_gain += (gain - self.avg_gain) / self.period
+                self.avg_loss += (loss - self.avg_loss) / self.period
+            if self.count >= self.period:
+                self.value = self._rsi()
+        self.prev = x
+        return self.value
+
+    def _rsi(self):
+        if self.avg_loss == 0:
+            return 100.0 if self.avg_gain > 0 else None
+        return 100 - 100 / (1 + self.avg_gain / self.avg_loss)
+
+    def to_dict(self):
+        return {"period": self.period, "prev": self.prev, "count": self.count,
+                "avg_gain": self.avg_gain, "avg_loss": self.avg_loss, "value": self.value}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        state = cls(data["period"])
+        state.prev, state.count, state.value = data["prev"], data["count"], data["value"]
+        state.avg_gain, state.avg_loss = data["avg_gain"], data["avg_loss"]
+        return state
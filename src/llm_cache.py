@@ -0,0 +1,85 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from src.storage import data_path
+from src.tracing import tracer
+
+
+class AnalysisCache:
+    """
+    Persistent cache for parsed analyst JSON, keyed by a hash of everything
+    that determines the completion (model, temperature, rendered prompt).
+
+    The prompt has no user-specific fields, so every holder of a ticker shares
+    one entry. Entries expire after `ttl` seconds and the least recently used
+    ones are evicted once the cache holds more than `max_entries`.
+    """
+
+    def __init__(self, path: str = None, ttl: float = 24 * 3600, max_entries: int = 5000):
+        self.path = path or data_path("llm_cache.sqlite")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS analyses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS analyses_lru ON analyses (last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def key(model: str, temperature: float, prompt: str):
+        payload = json.dumps([model, temperature, prompt])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM analyses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                tracer.count("cache.analysis.miss")
+                return None
+            self._conn.execute("UPDATE analyses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        tracer.count("cache.analysis.hit")
+        return json.loads(row[0])
+
+    def put(self, key: str, analysis: dict):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?)", (key, json.dumps(analysis), now, now)
+            )
+            # Drop expired rows first, then the least recently used beyond the size bound
+            self._conn.execute("DELETE FROM analyses WHERE created_at < ?", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM analyses WHERE key IN ("
+                "SELECT key FROM analyses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+        }
+
+    def close(self):
+        self._conn.close()
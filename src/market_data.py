@@ -0,0 +1,155 @@
+import threading
+
+from src.bulk_fetch import DEFAULT_BATCH_SIZE, download_bars
+from src.tools import get_financial_metrics
+from src.tracing import tracer
+
+
+def _history(ticker: str, **window):
+    import yfinance as yf
+
+    return yf.Ticker(ticker).history(**window)
+
+
+class MarketData:
+    """
+    Run-scoped market data layer.
+
+    Every Yahoo request the data collector needs (fundamentals, 1y daily bars
+    for the quant indicators, 5d intraday bars for the chart) is made at most
+    once per ticker per run, no matter how many users hold that ticker.
+    """
+
+    def __init__(self, tickers=(), batch_size: int = DEFAULT_BATCH_SIZE, store=None, fundamentals=None):
+        self._metrics = {}
+        self._history = {}
+        self._intraday = {}
+        self._indicators = {}
+        self._returns = None  # Shared ReturnsMatrix, and how many histories it covers
+        self._returns_size = 0
+        self._locks = {}
+        self._guard = threading.Lock()
+        self.calls = 0  # Number of external requests actually made
+        self.tickers = sorted({t.upper() for t in tickers})
+        self.batch_size = batch_size
+        self.store = store  # Optional PriceStore: only new bars are downloaded
+        self.fundamentals = fundamentals  # Optional Fundamentals: only stale fields are refetched
+
+    def _lock_for(self, key):
+        with self._guard:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    def _memo(self, store, ticker, fetch, name, counted=True):
+        ticker = ticker.upper()
+        tracer.count("cache.market_data.hit" if ticker in store else "cache.market_data.miss")
+        if ticker not in store:
+            # Per-ticker lock so concurrent users never fetch the same symbol twice
+            with self._lock_for((id(store), ticker)):
+                if ticker not in store:
+                    self.calls += counted
+                    try:
+                        with tracer.span(name, ticker=ticker):
+                            store[ticker] = fetch(ticker)
+                    except Exception as e:
+                        # Remember failures too, a bad symbol costs one request per run
+                        store[ticker] = e
+        result = store[ticker]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def metrics(self, ticker: str):
+        if self.fundamentals is not None:
+            # Fundamentals counts and traces its own (usually cheaper) requests
+            return self._memo(self._metrics, ticker, self.fundamentals.metrics, "fundamentals", counted=False)
+        return self._memo(self._metrics, ticker, get_financial_metrics, "yf.info")
+
+    def history(self, ticker: str):
+        """Daily bars for the last year (enough for the 200-day average)."""
+        return self._memo(self._history, ticker, lambda t: _history(t, period="1y"), "yf.history")
+
+    def intraday(self, ticker: str):
+        """30-minute bars for the last 5 days (covers the 24h chart window)."""
+        return self._memo(
+            self._intraday, ticker, lambda t: _history(t, period="5d", interval="30m"), "yf.history"
+        )
+
+    def indicators(self, ticker: str):
+        """
+        Latest technical indicators for `ticker`. The first call computes them for
+        every daily history cached so far in one vectorized pass.
+        """
+        ticker = ticker.upper()
+        if ticker not in self._indicators:
+            self.history(ticker)
+            with self._guard:
+                pending = {
+                    t: h for t, h in self._history.items()
+                    if t not in self._indicators and not isinstance(h, Exception)
+                }
+                if pending:
+                    from src.indicators import compute_indicators, price_matrix
+
+                    records = compute_indicators(
+                        price_matrix(pending, "Close"), price_matrix(pending, "High"), price_matrix(pending, "Low")
+                    )
+                    # Tickers without any bars still get a record, so they are not recomputed
+                    for t in pending:
+                        self._indicators[t] = records.get(t, {})
+        return self._indicators[ticker]
+
+    def returns(self):
+        """
+        The run's shared ReturnsMatrix over every daily history cached so far,
+        benchmark included. Built on first use and only rebuilt once tickers
+        have joined the run since.
+        """
+        from src.risk import BENCHMARK, ReturnsMatrix
+
+        try:
+            self.history(BENCHMARK)
+        except Exception:
+            pass  # Without the benchmark, beta is reported as N/A
+        with self._guard:
+            if self._returns is None or self._returns_size != len(self._history):
+                histories = {t: h for t, h in self._history.items() if not isinstance(h, Exception)}
+                with tracer.span("risk.returns_matrix", tickers=len(histories)):
+                    self._returns = ReturnsMatrix(histories)
+                self._returns_size = len(self._history)
+            return self._returns
+
+    def prefetch(self, tickers=None):
+        """
+        Warm the cache for every ticker in the run, or only for `tickers` (which
+        then join the run). Price bars come from a few batched multi-symbol
+        downloads; fundamentals are still per ticker.
+        """
+        if tickers is None:
+            tickers = self.tickers
+        else:
+            tickers = sorted({t.upper() for t in tickers})
+            self.tickers = sorted(set(self.tickers).union(tickers))
+        from src.risk import BENCHMARK
+
+        print(f"📡 Prefetching market data for {len(tickers)} unique tickers...")
+        for store, period, interval in ((self._history, "1y", "1d"), (self._intraday, "5d", "30m")):
+            # The benchmark's daily bars ride along for the risk metrics
+            wanted = tickers + [BENCHMARK] if store is self._history and BENCHMARK not in tickers else tickers
+            missing = [t for t in wanted if t not in store]
+            if not missing:
+                continue
+            if self.store is not None:
+                frames, requests = self.store.sync(missing, period, interval, batch_size=self.batch_size)
+            else:
+                frames, requests = download_bars(missing, period, interval, batch_size=self.batch_size)
+            store.update(frames)
+            self.calls += requests
+
+        for ticker in tickers:
+            try:
+                self.metrics(ticker)
+            except Exception as e:
+                print(f"⚠️ Prefetch failed for {ticker}: {e}")
+        return self
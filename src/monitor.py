@@ -0,0 +1,301 @@
+"""
+Intraday alert monitor: a long-running alternative to the daily batch.
+
+Polls intraday bars for every subscribed ticker (or replays recent ones),
+folds each new bar into O(1) indicator state and emails subscribers when a
+threshold is crossed:
+
+    python -m src.monitor                          # poll 5m bars every minute
+    python -m src.monitor --replay --period 5d     # stream the last 5 days through, then exit
+"""
+import argparse
+import bisect
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from src.indicators import SMAState, WilderRSIState
+from src.storage import data_path
+from src.tools import send_email
+
+RSI_HIGH = 70
+RSI_LOW = 30
+# The same alert for the same ticker is not repeated within this many seconds
+COOLDOWN = 4 * 3600
+# Yahoo only serves intraday bars from the last 60 days
+INTRADAY_REACH = timedelta(days=59)
+
+
+class TickerMonitor:
+    """Indicator state plus alert memory for one ticker."""
+
+    def __init__(self, ticker: str):
+        self.ticker = ticker
+        self.sma_fast = SMAState(50)
+        self.sma_slow = SMAState(200)
+        self.rsi = WilderRSIState(14)
+        self.last_ts = None   # epoch seconds of the last bar folded in
+        self.rsi_zone = None  # "overbought", "oversold" or "neutral"
+        self.trend = None     # +1 while SMA 50 is above SMA 200, -1 below
+        self.last_alert = {}  # alert kind -> epoch seconds
+
+    def update(self, ts: int, close: float, cooldown: float = COOLDOWN):
+        """Folds in one bar; returns the alerts it triggered (none for bars already seen)."""
+        if self.last_ts is not None and ts <= self.last_ts:
+            return []
+        self.last_ts = ts
+        fast, slow, rsi = self.sma_fast.update(close), self.sma_slow.update(close), self.rsi.update(close)
+
+        alerts = []
+        if rsi is not None:
+            zone = "overbought" if rsi > RSI_HIGH else "oversold" if rsi < RSI_LOW else "neutral"
+            if self.rsi_zone is not None and zone != self.rsi_zone and zone != "neutral":
+                alerts.append(("rsi_" + zone, f"RSI {rsi:.1f} is {zone} ({'above' if zone == 'overbought' else 'below'} "
+                                              f"{RSI_HIGH if zone == 'overbought' else RSI_LOW})"))
+            self.rsi_zone = zone
+
+        if fast is not None and slow is not None and fast != slow:
+            trend = 1 if fast > slow else -1
+            if self.trend is not None and trend != self.trend:
+                name = "golden_cross" if trend > 0 else "death_cross"
+                alerts.append((name, f"SMA 50 crossed {'above' if trend > 0 else 'below'} SMA 200 "
+                                     f"({'golden' if trend > 0 else 'death'} cross)"))
+            self.trend = trend
+
+        fired = []
+        for kind, message in alerts:
+            if ts - self.last_alert.get(kind, float("-inf")) >= cooldown:
+                self.last_alert[kind] = ts
+                fired.append({"ticker": self.ticker, "kind": kind, "message": message, "price": close, "ts": ts})
+        return fired
+
+    def to_dict(self):
+        return {
+            "sma_fast": self.sma_fast.to_dict(), "sma_slow": self.sma_slow.to_dict(), "rsi": self.rsi.to_dict(),
+            "last_ts": self.last_ts, "rsi_zone": self.rsi_zone, "trend": self.trend, "last_alert": self.last_alert,
+        }
+
+    @classmethod
+    def from_dict(cls, ticker: str, data: dict):
+        monitor = cls(ticker)
+        monitor.sma_fast = SMAState.from_dict(data["sma_fast"])
+        monitor.sma_slow = SMAState.from_dict(data["sma_slow"])
+        monitor.rsi = WilderRSIState.from_dict(data["rsi"])
+        monitor.last_ts, monitor.rsi_zone, monitor.trend = data["last_ts"], data["rsi_zone"], data["trend"]
+        monitor.last_alert = data["last_alert"]
+        return monitor
+
+
+def render_alerts(alerts: list):
+    rows = "".join(
+        f"<li><b>{a['ticker']}</b> at ${a['price']:,.2f}: {a['message']}</li>" for a in alerts
+    )
+    return (
+        '<div style="font-family: Arial, sans-serif;">'
+        f"<h2>Naxera AI Alerts</h2><ul>{rows}</ul>"
+        '<p style="color: #6b7280; font-size: 12px;">Technical signals only, not financial advice.</p></div>'
+    )
+
+
+class AlertMonitor:
+    """
+    Incremental indicators for every subscribed ticker.
+
+    feed() takes a date x ticker close matrix and only looks at bars newer than
+    each ticker's last one, so a poll costs O(new bars). Yahoo's newest bar is
+    still forming, so polls hold it back until a newer one arrives, and each
+    poll reaches back to the oldest bar any ticker has seen, so a monitor that
+    was down catches up on the gap. Alerts are grouped per subscriber and sent
+    through send_email once per poll. The whole state is saved as JSON, so a
+    restart picks up without re-warming.
+    """
+
+    def __init__(self, subscribers: dict, interval: str = "5m", state_path: str = None,
+                 cooldown: float = COOLDOWN, batch_size: int = 100, send=send_email):
+        self.subscribers = {t.upper(): set(emails) for t, emails in subscribers.items()}
+        self.interval = interval
+        self.state_path = state_path or data_path(f"monitor_{interval}.json")
+        self.cooldown = cooldown
+        self.batch_size = batch_size
+        self.send = send
+        self.monitors = {}
+        self.sent = 0
+        self.load()
+
+    @property
+    def tickers(self):
+        return sorted(self.subscribers)
+
+    def _monitor(self, ticker: str):
+        if ticker not in self.monitors:
+            self.monitors[ticker] = TickerMonitor(ticker)
+        return self.monitors[ticker]
+
+    def load(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                saved = json.load(f)
+            self.monitors = {t: TickerMonitor.from_dict(t, data) for t, data in saved.items()}
+            print(f"♻️ Restored indicator state for {len(self.monitors)} tickers")
+
+    def save(self):
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({t: m.to_dict() for t, m in self.monitors.items()}, f)
+        os.replace(tmp, self.state_path)
+
+    def feed(self, close, notify: bool = True):
+        """Folds a date x ticker close matrix into the state; returns the alerts (none while warming up)."""
+        if close.empty:
+            return []
+        from src.price_store import _to_epoch
+
+        stamps = _to_epoch(close.index).tolist()
+        monitors = [self._monitor(ticker.upper()) for ticker in close.columns]
+        alerts = []
+        # Plain Python floats, column by column: pandas indexing per bar would dominate
+        for monitor, values in zip(monitors, close.to_numpy(dtype=float).T.tolist()):
+            # Skip straight past bars this ticker has already seen
+            start = 0 if monitor.last_ts is None else bisect.bisect_right(stamps, monitor.last_ts)
+            for ts, value in zip(stamps[start:], values[start:]):
+                if value == value:  # not NaN
+                    fired = monitor.update(ts, value, self.cooldown)
+                    if notify and fired:
+                        alerts += fired
+        return alerts
+
+    def notify(self, alerts: list):
+        """One email per subscriber with every alert on the tickers they hold."""
+        by_user = {}
+        for alert in alerts:
+            for email in self.subscribers.get(alert["ticker"], ()):
+                by_user.setdefault(email, []).append(alert)
+        for email, user_alerts in by_user.items():
+            first = user_alerts[0]
+            subject = (f"Naxera AI Alert: {first['ticker']} {first['message']}" if len(user_alerts) == 1
+                       else f"Naxera AI Alerts: {len(user_alerts)} signals on your portfolio")
+            if self.send(to=email, subject=subject, body=render_alerts(user_alerts)):
+                self.sent += 1
+        return len(by_user)
+
+    def _download(self, period: str = None, tickers=None, start=None):
+        from src.bulk_fetch import download_bars
+        from src.indicators import price_matrix
+
+        frames, _ = download_bars(tickers or self.tickers, period, self.interval, batch_size=self.batch_size,
+                                  start=start)
+        return price_matrix(frames, "Close")
+
+    @staticmethod
+    def _settled(close):
+        """Drops the newest bar: it is still forming, and its close would be folded in before it is final."""
+        return close.iloc[:-1]
+
+    def _since(self):
+        """Start date of a poll: the day of the oldest last bar across the subscribed tickers (None: never polled)."""
+        seen = [self.monitors[t].last_ts for t in self.tickers
+                if t in self.monitors and self.monitors[t].last_ts is not None]
+        if not seen:
+            return None
+        since = datetime.fromtimestamp(min(seen), tz=timezone.utc)
+        oldest = datetime.now(timezone.utc) - INTRADAY_REACH
+        if since < oldest:
+            print(f"⚠️ Monitor state is older than Yahoo's intraday history, bars before {oldest:%Y-%m-%d} are lost")
+            since = oldest
+        return since.date()
+
+    def warm_up(self, period: str = "5d"):
+        """Seeds the indicators of tickers without saved state from recent history, without alerting on it."""
+        missing = [t for t in self.tickers if t not in self.monitors]
+        if missing:
+            print(f"🔥 Warming up {len(missing)} tickers from the last {period} of {self.interval} bars...")
+            self.feed(self._settled(self._download(period, missing)), notify=False)
+            self.save()
+
+    def poll(self):
+        since = self._since()
+        close = self._download(start=since) if since is not None else self._download("1d")
+        alerts = self.feed(self._settled(close))
+        users = self.notify(alerts) if alerts else 0
+        self.save()
+        return alerts, users
+
+    def replay(self, period: str = "5d", speed: float = 0.0):
+        """
+        Streams the last `period` of bars through fresh indicator state bar by
+        bar, as if they arrived live. The saved live state is left untouched.
+        """
+        close = self._download(period)
+        self.monitors = {}
+        if close.empty:
+            return 0
+        from src.price_store import _to_epoch
+
+        stamps = _to_epoch(close.index).tolist()
+        monitors = [self._monitor(ticker.upper()) for ticker in close.columns]
+        total = 0
+        for ts, row in zip(stamps, close.to_numpy(dtype=float).tolist()):
+            alerts = []
+            for monitor, value in zip(monitors, row):
+                if value == value:  # not NaN
+                    fired = monitor.update(ts, value, self.cooldown)
+                    if fired:
+                        alerts += fired
+            if alerts:
+                total += len(alerts)
+                self.notify(alerts)
+            if speed:
+                time.sleep(speed)
+        return total
+
+    def run(self, poll_seconds: float = 60, max_polls: int = None):
+        print(f"👀 Monitoring {len(self.tickers)} tickers on {self.interval} bars every {poll_seconds:.0f}s...")
+        polls = 0
+        try:
+            while max_polls is None or polls < max_polls:
+                started = time.perf_counter()
+                alerts, users = self.poll()
+                polls += 1
+                print(f"🔔 Poll {polls}: {len(alerts)} alerts to {users} users "
+                      f"({time.perf_counter() - started:.2f}s)")
+                time.sleep(max(0.0, poll_seconds - (time.perf_counter() - started)))
+        except KeyboardInterrupt:
+            print("🛑 Stopping monitor")
+        finally:
+            self.save()
+
+
+def load_subscribers(supabase):
+    """{ticker: {emails}} for every active subscription."""
+    from src.subscriptions import iter_portfolios
+
+    subscribers = {}
+    for email, portfolio in iter_portfolios(supabase):
+        for holding in portfolio:
+            subscribers.setdefault(holding["ticker"].upper(), set()).add(email)
+    return subscribers
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    from src.clients import get_supabase
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Email subscribers when intraday technical thresholds are crossed.")
+    parser.add_argument("--interval", default="5m", help="Bar size to monitor (default: 5m)")
+    parser.add_argument("--poll-seconds", type=float, default=60)
+    parser.add_argument("--max-polls", type=int, default=None, help="Stop after this many polls (default: run forever)")
+    parser.add_argument("--replay", action="store_true", help="Replay the last --period of bars instead of polling")
+    parser.add_argument("--period", default="5d", help="History used to warm up, or to replay (default: 5d)")
+    parser.add_argument("--dry-run", action="store_true", help="Print alerts instead of emailing them")
+    args = parser.parse_args()
+
+    send = (lambda to, subject, body: print(f"🔔 {to}: {subject}") or True) if args.dry_run else send_email
+    monitor = AlertMonitor(load_subscribers(get_supabase()), interval=args.interval, send=send)
+    if args.replay:
+        print(f"⏪ Replayed {monitor.replay(args.period)} alerts, {monitor.sent} emails sent")
+    else:
+        monitor.warm_up(args.period)
+        monitor.run(args.poll_seconds, args.max_polls)
@@ -0,0 +1,117 @@
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.storage import data_path
+from src.tracing import tracer
+
+MARKET_QUERY = "US stock market pre-market news today"
+FALLBACK_NEWS = "Standard market conditions."
+
+
+class NewsCache:
+    """Tavily results on disk, keyed by query, so a re-run within `ttl` seconds is free."""
+
+    def __init__(self, path: str = None, ttl: float = 6 * 3600):
+        self.path = path or data_path("news_cache.sqlite")
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS news (query TEXT PRIMARY KEY, results TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, query: str):
+        with self._lock:
+            row = self._conn.execute("SELECT results, fetched_at FROM news WHERE query = ?", (query,)).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return json.loads(row[0])
+
+    def put(self, query: str, results: list):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO news VALUES (?, ?, ?)", (query, json.dumps(results), time.time())
+            )
+            self._conn.commit()
+
+
+class NewsService:
+    """
+    Run-scoped news retrieval shared by every user graph.
+
+    The broad market search runs once per run. With per_ticker=True, each unique
+    ticker also gets its own headlines: fetched concurrently, deduplicated by URL
+    and cached on disk, so Tavily calls scale with tickers, not users.
+    """
+
+    def __init__(self, client, cache: NewsCache = None, per_ticker: bool = False, max_workers: int = 8):
+        self.client = client
+        self.cache = cache
+        self.per_ticker = per_ticker
+        self.max_workers = max_workers
+        self.calls = 0  # Tavily requests actually made
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def _search(self, query: str, max_results: int):
+        """Memoized for the run, then the disk cache, then Tavily."""
+        with self._lock:
+            if query in self._results:
+                return self._results[query]
+        results = self.cache.get(query) if self.cache else None
+        tracer.count("cache.news.hit" if results is not None else "cache.news.miss")
+        if results is None:
+            self.calls += 1
+            with tracer.span("tavily.search", query=query):
+                response = self.client.search(query=query, topic="news", days=1, max_results=max_results)
+            results = [
+                {"title": r.get("title", ""), "url": r.get("url", "")}
+                for r in response.get("results", [])
+            ]
+            if self.cache:
+                self.cache.put(query, results)
+        with self._lock:
+            self._results[query] = results
+        return results
+
+    def market_news(self):
+        try:
+            results = self._search(MARKET_QUERY, 5)
+        except Exception as e:
+            print(f"⚠️ Market news unavailable: {e}")
+            return FALLBACK_NEWS
+        return " ".join(r["title"] for r in results[:4]) or FALLBACK_NEWS
+
+    def _ticker_articles(self, ticker: str):
+        try:
+            results = self._search(f"{ticker} stock news", 5)
+        except Exception as e:
+            print(f"⚠️ News unavailable for {ticker}: {e}")
+            return []
+        # Skip repeats and anything the broad market headlines already cover
+        seen = {r["url"] for r in self._results.get(MARKET_QUERY, [])}
+        articles = []
+        for r in results:
+            if r["url"] and r["url"] not in seen:
+                seen.add(r["url"])
+                articles.append(r)
+        return articles
+
+    def prefetch(self, tickers):
+        """Fetches market news and, in per-ticker mode, every ticker's news concurrently."""
+        self.market_news()
+        if self.per_ticker:
+            tickers = sorted(set(tickers))
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                list(pool.map(self._ticker_articles, tickers))
+        return self
+
+    def headlines(self, ticker: str, limit: int = 3):
+        """Ticker-specific headlines, or "" when per-ticker news is off."""
+        if not self.per_ticker:
+            return ""
+        return " ".join(r["title"] for r in self._ticker_articles(ticker)[:limit])
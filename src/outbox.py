@@ -0,0 +1,271 @@
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from datetime import date
+
+from src.storage import data_path
+from src.tracing import tracer
+
+# Resend accepts at most 100 emails per batch call
+RESEND_BATCH_LIMIT = 100
+
+
+def idempotency_key(email: str, run_date: str, kind: str = "daily-report"):
+    """One key per user per day: re-running the job can never email them twice."""
+    digest = hashlib.sha256(email.strip().lower().encode("utf-8")).hexdigest()[:24]
+    return f"{kind}/{run_date}/{digest}"
+
+
+def _sender():
+    return os.getenv("SENDER_EMAIL", "Naxera AI <onboarding@resend.dev>")
+
+
+class SendLog:
+    """Local record of idempotency keys that were delivered, kept in the data directory."""
+
+    def __init__(self, path: str = None):
+        self.path = path or data_path("outbox.sqlite")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sent ("
+            "key TEXT PRIMARY KEY, recipient TEXT NOT NULL, message_id TEXT, sent_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def was_sent(self, key: str):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM sent WHERE key = ?", (key,)).fetchone() is not None
+
+    def record(self, key: str, recipient: str, message_id: str = None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sent VALUES (?, ?, ?, ?)", (key, recipient, message_id, time.time())
+            )
+            self._conn.commit()
+
+
+# --- TRANSPORTS ---
+# A transport takes a list of messages and returns ({key: message_id} for the
+# ones it delivered, {key: error} for the ones it could not). Raising means the
+# transport itself failed and the whole chunk may be retried.
+
+class DeliveryError(Exception):
+    """One message was refused; `status_code` follows HTTP (4xx: don't retry)."""
+
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _status(error):
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    try:
+        return int(status)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_permanent(error):
+    """A 4xx other than timeout/rate limit: sending the same message again won't help."""
+    status = _status(error)
+    return status is not None and 400 <= status < 500 and status not in (408, 429)
+
+
+class ResendTransport:
+    """
+    Sends through Resend. Plain messages go out together through the batch
+    endpoint; Resend's batch API does not take attachments, so messages with
+    charts are sent one by one. Every request carries an Idempotency-Key, and
+    a failed request only fails the messages it carried.
+    """
+
+    max_batch = RESEND_BATCH_LIMIT
+
+    def _params(self, message: dict):
+        params = {
+            "from": _sender(),
+            "to": [message["to"]],
+            "subject": message["subject"],
+            "html": message["html"],
+        }
+        if message.get("attachments"):
+            params["attachments"] = message["attachments"]
+        return params
+
+    def send(self, messages: list):
+        import resend
+
+        resend.api_key = os.getenv("RESEND_API_KEY")
+        delivered, errors = {}, {}
+
+        plain = [m for m in messages if not m.get("attachments")]
+        if plain:
+            batch_key = hashlib.sha256("|".join(m["key"] for m in plain).encode("utf-8")).hexdigest()
+            try:
+                with tracer.span("resend.batch", emails=len(plain)):
+                    response = resend.Batch.send(
+                        [self._params(m) for m in plain], {"idempotency_key": f"batch/{batch_key}"}
+                    )
+                for message, sent in zip(plain, response["data"]):
+                    delivered[message["key"]] = sent.get("id")
+            except Exception as e:
+                errors.update({m["key"]: e for m in plain})
+
+        for message in messages:
+            if message.get("attachments"):
+                try:
+                    with tracer.span("resend.send"):
+                        response = resend.Emails.send(self._params(message), {"idempotency_key": message["key"]})
+                    delivered[message["key"]] = response.get("id")
+                except Exception as e:
+                    errors[message["key"]] = e
+
+        return delivered, errors
+
+
+class FileTransport:
+    """
+    Offline stand-in: writes each message as JSON into `directory`. Optional
+    `latency` (seconds per call), `failure_rate` (whole-call failures) and
+    `reject` (recipients refused with a 422) let tests exercise throughput and
+    the outbox retry paths without touching the network.
+    """
+
+    max_batch = RESEND_BATCH_LIMIT
+
+    def __init__(self, directory: str, latency: float = 0.0, failure_rate: float = 0.0, seed: int = None,
+                 reject=()):
+        self.directory = directory
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.reject = set(reject)
+        self.calls = 0
+        self.chunks = []  # size of every call
+        self._random = random.Random(seed)
+        os.makedirs(directory, exist_ok=True)
+
+    def send(self, messages: list):
+        self.calls += 1
+        self.chunks.append(len(messages))
+        if self.latency:
+            time.sleep(self.latency)
+        if self._random.random() < self.failure_rate:
+            raise ConnectionError("simulated transport failure")
+
+        delivered, errors = {}, {}
+        for message in messages:
+            if message["to"] in self.reject:
+                errors[message["key"]] = DeliveryError(f"invalid recipient {message['to']}", status_code=422)
+                continue
+            message_id = hashlib.sha256(message["key"].encode("utf-8")).hexdigest()[:16]
+            with open(os.path.join(self.directory, f"{message_id}.json"), "w") as f:
+                json.dump({**message, "from": _sender(), "id": message_id}, f)
+            delivered[message["key"]] = message_id
+        return delivered, errors
+
+
+def transport_from_env():
+    """NAXERA_EMAIL_TRANSPORT: 'resend' (default) or 'file:<directory>'."""
+    setting = os.getenv("NAXERA_EMAIL_TRANSPORT", "resend")
+    if setting.startswith("file:"):
+        return FileTransport(setting[len("file:"):])
+    return ResendTransport()
+
+
+# --- OUTBOX ---
+class Outbox:
+    """
+    Queue of rendered reports, delivered in chunks through a transport.
+
+    enqueue() skips anyone whose idempotency key for `run_date` is already in
+    the send log, and flushes automatically once a full chunk is waiting.
+    Messages that failed transiently (or whose whole request failed) are
+    retried up to `max_retries` times with exponential backoff; permanent 4xx
+    refusals are not retried. Delivered messages are logged either way.
+    """
+
+    def __init__(self, transport=None, log: SendLog = None, run_date: str = None,
+                 chunk_size: int = 50, max_retries: int = 3, backoff: float = 1.0):
+        self.transport = transport or transport_from_env()
+        self.log = log or SendLog()
+        self.run_date = run_date or date.today().isoformat()
+        self.chunk_size = min(chunk_size, self.transport.max_batch)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.sent = 0
+        self.skipped = 0
+        self.retries = 0
+        self.failed = {}
+        self._queue = []
+        self._queue_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+
+    def delivered(self, to: str):
+        """True once today's report to `to` is in the send log."""
+        return self.log.was_sent(idempotency_key(to, self.run_date))
+
+    def enqueue(self, to: str, subject: str, html: str, attachments=None):
+        """Queues one report; returns False if this user already got today's email."""
+        key = idempotency_key(to, self.run_date)
+        if self.log.was_sent(key):
+            print(f"⏭️ {to} already received today's report, skipping.")
+            self.skipped += 1
+            return False
+
+        with self._queue_lock:
+            self._queue.append(
+                {"key": key, "to": to, "subject": subject, "html": html, "attachments": attachments or []}
+            )
+            full = len(self._queue) >= self.chunk_size
+        if full:
+            self.flush()
+        return True
+
+    def _send_chunk(self, chunk: list):
+        pending = chunk
+        for attempt in range(self.max_retries + 1):
+            try:
+                delivered, errors = self.transport.send(pending)
+            except Exception as e:
+                # The transport itself failed: nothing in the chunk went out
+                delivered, errors = {}, {message["key"]: e for message in pending}
+
+            retry = []
+            for message in pending:
+                key = message["key"]
+                if key in delivered:
+                    self.log.record(key, message["to"], delivered[key])
+                    self.sent += 1
+                    print(f"📧 Email sent to {message['to']}! ID: {delivered[key]}")
+                elif key in errors and not is_permanent(errors[key]) and attempt < self.max_retries:
+                    retry.append(message)
+                else:
+                    error = errors.get(key, "not accepted by transport")
+                    tracer.count("outbox.failed")
+                    self.failed[message["to"]] = str(error)
+                    print(f"❌ Failed to send to {message['to']}: {error}")
+            if not retry:
+                return
+
+            self.retries += 1
+            tracer.count("outbox.retry")
+            wait = self.backoff * 2 ** attempt
+            print(f"🔁 Send failed ({errors[retry[0]['key']]}), retrying {len(retry)} emails in {wait:.1f}s...")
+            time.sleep(wait)
+            pending = retry
+
+    def flush(self):
+        """Sends everything queued so far."""
+        with self._send_lock:
+            with self._queue_lock:
+                pending, self._queue = self._queue, []
+            for start in range(0, len(pending), self.chunk_size):
+                self._send_chunk(pending[start:start + self.chunk_size])
+
+    def stats(self):
+        return {"sent": self.sent, "skipped": self.skipped, "retries": self.retries, "failed": len(self.failed)}
@@ -0,0 +1,222 @@
+import argparse
+import sqlite3
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+import pandas as pd
+
+from src.bulk_fetch import DEFAULT_BATCH_SIZE, download_bars
+from src.storage import data_path
+
+COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+# How far back a load reaches from the newest stored bar, per yfinance period
+PERIOD_WINDOWS = {
+    "5d": timedelta(days=7),
+    "1mo": timedelta(days=31),
+    "3mo": timedelta(days=92),
+    "6mo": timedelta(days=183),
+    "1y": timedelta(days=366),
+    "2y": timedelta(days=731),
+}
+
+# Incremental fetches re-download a little history so we can spot re-adjusted prices
+OVERLAP = {"1d": timedelta(days=5), "30m": timedelta(days=1)}
+
+# compact() keeps this much history per interval
+RETENTION = {"1d": timedelta(days=731), "30m": timedelta(days=60)}
+
+
+def _is_daily(interval: str):
+    return interval.endswith(("d", "wk", "mo"))
+
+
+def _to_epoch(index):
+    idx = pd.DatetimeIndex(index)
+    if idx.tz is None:
+        idx = idx.tz_localize("UTC")
+    return idx.tz_convert("UTC").as_unit("s").asi8
+
+
+def _from_epoch(values, interval: str):
+    idx = pd.to_datetime(values, unit="s", utc=True)
+    # Daily bars are plain dates, same as yf.download returns them
+    return idx.tz_localize(None) if _is_daily(interval) else idx
+
+
+class PriceStore:
+    """
+    On-disk OHLCV store keyed by (ticker, interval), backed by a single SQLite file.
+
+    The file lives in the data directory, so a local run and a GitHub Actions
+    cache entry look the same. sync() only downloads bars newer than what is
+    already stored; compact() trims old bars and rebuild() starts over.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or data_path("prices.sqlite")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA mmap_size = 268435456")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS bars (
+                ticker TEXT NOT NULL,
+                interval TEXT NOT NULL,
+                ts INTEGER NOT NULL,
+                open REAL, high REAL, low REAL, close REAL, volume REAL,
+                PRIMARY KEY (ticker, interval, ts)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    # --- Reads ---
+    def last_timestamp(self, ticker: str, interval: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(ts) FROM bars WHERE ticker = ? AND interval = ?", (ticker, interval)
+            ).fetchone()
+        return row[0]
+
+    def load(self, ticker: str, interval: str, period: str = "1y"):
+        """Returns the stored bars covering `period` back from the newest bar."""
+        last = self.last_timestamp(ticker, interval)
+        if last is None:
+            return pd.DataFrame(columns=COLUMNS)
+
+        since = last - int(PERIOD_WINDOWS[period].total_seconds())
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT ts, open, high, low, close, volume FROM bars "
+                "WHERE ticker = ? AND interval = ? AND ts >= ? ORDER BY ts",
+                (ticker, interval, since),
+            ).fetchall()
+
+        frame = pd.DataFrame([r[1:] for r in rows], columns=COLUMNS)
+        frame.index = _from_epoch([r[0] for r in rows], interval)
+        return frame
+
+    # --- Writes ---
+    def append(self, ticker: str, interval: str, frame):
+        """Merges bars into the store; bars at an existing timestamp are replaced."""
+        if frame is None or frame.empty:
+            return 0
+        frame = frame.reindex(columns=COLUMNS)
+        rows = [
+            (ticker, interval, int(ts), *(None if pd.isna(v) else float(v) for v in values))
+            for ts, values in zip(_to_epoch(frame.index), frame.itertuples(index=False))
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+        return len(rows)
+
+    def delete(self, tickers=None, interval: str = None):
+        """Drops stored bars for the given tickers (all tickers if None)."""
+        query, args = "DELETE FROM bars WHERE 1 = 1", []
+        if tickers is not None:
+            tickers = list(tickers)
+            query += f" AND ticker IN ({', '.join('?' * len(tickers))})"
+            args += tickers
+        if interval is not None:
+            query += " AND interval = ?"
+            args.append(interval)
+        with self._lock:
+            self._conn.execute(query, args)
+            self._conn.commit()
+
+    def compact(self, retention=None):
+        """Trims bars older than the retention window per interval and reclaims space."""
+        retention = retention or RETENTION
+        with self._lock:
+            for interval, keep in retention.items():
+                row = self._conn.execute("SELECT MAX(ts) FROM bars WHERE interval = ?", (interval,)).fetchone()
+                if row[0] is not None:
+                    cutoff = row[0] - int(keep.total_seconds())
+                    self._conn.execute("DELETE FROM bars WHERE interval = ? AND ts < ?", (interval, cutoff))
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+
+    def rebuild(self, tickers=None):
+        """Forgets stored bars so the next sync() downloads full history again."""
+        self.delete(tickers)
+        with self._lock:
+            self._conn.execute("VACUUM")
+
+    # --- Incremental update ---
+    def _was_readjusted(self, ticker: str, interval: str, fresh, last: int):
+        """
+        Adjusted prices are rewritten by Yahoo after splits and dividends. If the
+        overlapping (already final) bars no longer match, the stored series is stale.
+        """
+        stored = self.load(ticker, interval, "5d")
+        stored = stored[_to_epoch(stored.index) < last]["Close"]
+        fresh_close = fresh["Close"].copy()
+        fresh_close.index = _from_epoch(_to_epoch(fresh.index), interval)
+        common = stored.index.intersection(fresh_close.index)
+        if common.empty:
+            return False
+        diff = (stored[common] - fresh_close[common]).abs() / stored[common].abs()
+        return bool((diff > 1e-4).any())
+
+    def sync(self, tickers, period: str, interval: str, batch_size: int = DEFAULT_BATCH_SIZE):
+        """
+        Brings every ticker up to date and returns ({ticker: DataFrame}, requests made).
+
+        Tickers seen for the first time get the full `period`. Everything else only
+        fetches bars since its last stored timestamp (minus a small overlap), grouped
+        so tickers with the same last bar share one batched download.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        requests = 0
+        cold = []
+        warm = defaultdict(list)
+        last_seen = {}
+
+        for ticker in tickers:
+            last = self.last_timestamp(ticker, interval)
+            if last is None:
+                cold.append(ticker)
+                continue
+            last_seen[ticker] = last
+            start = (_from_epoch([last], interval)[0] - OVERLAP.get(interval, timedelta(days=1))).date()
+            warm[start].append(ticker)
+
+        for start, group in warm.items():
+            frames, n = download_bars(group, interval=interval, batch_size=batch_size, start=start)
+            requests += n
+            for ticker, frame in frames.items():
+                if not frame.empty and self._was_readjusted(ticker, interval, frame, last_seen[ticker]):
+                    print(f"♻️ {ticker} prices were re-adjusted, refetching full history...")
+                    self.delete([ticker], interval)
+                    cold.append(ticker)
+                else:
+                    self.append(ticker, interval, frame)
+
+        if cold:
+            frames, n = download_bars(cold, period, interval, batch_size=batch_size)
+            requests += n
+            for ticker, frame in frames.items():
+                self.append(ticker, interval, frame)
+
+        return {ticker: self.load(ticker, interval, period) for ticker in tickers}, requests
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the local OHLCV price store.")
+    parser.add_argument("command", choices=["compact", "rebuild"])
+    parser.add_argument("tickers", nargs="*", help="Only rebuild these tickers (default: all)")
+    args = parser.parse_args()
+
+    store = PriceStore()
+    if args.command == "compact":
+        store.compact()
+    else:
+        store.rebuild(args.tickers or None)
+    print(f"✅ {args.command} done: {store.path}")
+    store.close()
@@ -0,0 +1,243 @@
+import hashlib
+import json
+import re
+import threading
+from string import Formatter
+
+from src.tracing import tracer
+
+
+def minify_html(html: str):
+    """Drops indentation and the whitespace between tags; text content keeps single spaces."""
+    html = re.sub(r">\s+<", "><", html.strip())
+    # Same for whitespace between a tag and a template placeholder
+    html = re.sub(r">\s+\{", ">{", html)
+    html = re.sub(r"\}\s+<", "}<", html)
+    return re.sub(r"\s{2,}", " ", html)
+
+
+class CompiledTemplate:
+    """
+    A str.format-style template that is minified and parsed into literal/field
+    pairs once, so rendering is a single join. Values are inserted as-is.
+    """
+
+    def __init__(self, source: str):
+        self.parts = [
+            (literal, field)
+            for literal, field, _, _ in Formatter().parse(minify_html(source))
+        ]
+
+    def render(self, **values):
+        return "".join(
+            literal + (str(values[field]) if field is not None else "")
+            for literal, field in self.parts
+        )
+
+
+# --- TEMPLATES (compiled once at import) ---
+# Per-user part of a stock card: the holding size and its value
+CARD_OPEN = CompiledTemplate("""
+<div style="background-color: #ffffff; border-radius: 8px; overflow: hidden; box-shadow: 0 4px 6px rgba(0,0,0,0.1); margin-bottom: 20px;">
+    <div style="padding: 15px 25px; border-bottom: 1px solid #e5e7eb; background-color: #f9fafb; display: flex; justify-content: space-between; align-items: center;">
+        <h2 style="margin: 0; font-size: 20px; color: #111827; font-weight: bold;">{ticker} <span style="font-size: 14px; color: #6b7280; font-weight: normal; margin-left: 8px;">({shares} shares)</span></h2>
+        <h2 style="margin: 0; font-size: 20px; color: #111827;">${value}</h2>
+    </div>
+""")
+
+CARD_CLOSE = "</div>"
+
+# Same for every holder of the ticker: quant grid, analysis, metrics and verdict
+CARD_BODY = CompiledTemplate("""
+<div style="padding: 25px;">
+
+    <h3 style="margin-top: 0; color: #374151; font-size: 16px; border-bottom: 2px solid #e5e7eb; padding-bottom: 8px;">Quantitative & Technical Analysis</h3>
+
+    <div style="display: flex; gap: 10px; margin-bottom: 20px;">
+        <div style="flex: 1; background-color: #f3f4f6; padding: 12px; border-radius: 6px; text-align: center; border: 1px solid #e5e7eb;">
+            <span style="display: block; font-size: 11px; color: #6b7280; text-transform: uppercase; font-weight: bold; margin-bottom: 4px;">RSI (14-Day)</span>
+            <span style="font-size: 18px; font-weight: bold; color: #111827;">{rsi}</span>
+        </div>
+        <div style="flex: 1; background-color: #f3f4f6; padding: 12px; border-radius: 6px; text-align: center; border: 1px solid #e5e7eb;">
+            <span style="display: block; font-size: 11px; color: #6b7280; text-transform: uppercase; font-weight: bold; margin-bottom: 4px;">50-Day SMA</span>
+            <span style="font-size: 18px; font-weight: bold; color: #111827;">{sma_50}</span>
+        </div>
+        <div style="flex: 1; background-color: #f3f4f6; padding: 12px; border-radius: 6px; text-align: center; border: 1px solid #e5e7eb;">
+            <span style="display: block; font-size: 11px; color: #6b7280; text-transform: uppercase; font-weight: bold; margin-bottom: 4px;">200-Day SMA</span>
+            <span style="font-size: 18px; font-weight: bold; color: #111827;">{sma_200}</span>
+        </div>
+    </div>
+
+    <p style="color: #4b5563; line-height: 1.7; margin-bottom: 30px; font-size: 14px;">
+        {quant_analysis}
+    </p>
+
+    <h3 style="margin-top: 0; color: #374151; font-size: 16px; border-bottom: 2px solid #e5e7eb; padding-bottom: 8px;">Executive Summary</h3>
+    <p style="color: #4b5563; line-height: 1.6; margin-bottom: 25px; font-size: 14px;">
+        {summary}
+    </p>
+
+    <h3 style="margin-top: 0; color: #374151; font-size: 16px; border-bottom: 2px solid #e5e7eb; padding-bottom: 8px;">Key Metrics</h3>
+    <table style="width: 100%; margin-bottom: 25px; border-collapse: collapse; font-size: 14px;">
+        <tr>
+            <td style="padding: 10px; background-color: #f9fafb; border: 1px solid #e5e7eb; font-weight: bold; color: #374151; width: 30%;">Price</td>
+            <td style="padding: 10px; border: 1px solid #e5e7eb; color: #111827;">${price}</td>
+        </tr>
+        <tr>
+            <td style="padding: 10px; background-color: #f9fafb; border: 1px solid #e5e7eb; font-weight: bold; color: #374151;">Target</td>
+            <td style="padding: 10px; border: 1px solid #e5e7eb; color: #111827;">${target_mean_price}</td>
+        </tr>
+        <tr>
+            <td style="padding: 10px; background-color: #f9fafb; border: 1px solid #e5e7eb; font-weight: bold; color: #374151;">P/E Ratio</td>
+            <td style="padding: 10px; border: 1px solid #e5e7eb; color: #111827;">{pe_ratio}</td>
+        </tr>
+    </table>
+
+    <div style="background-color: {verdict_color}15; border-left: 4px solid {verdict_color}; padding: 15px;">
+        <strong style="color: {verdict_color}; font-size: 16px; display: block; margin-bottom: 5px;">VERDICT: {verdict}</strong>
+        <span style="color: #374151; font-size: 14px;">{rationale}</span>
+    </div>
+</div>
+""")
+
+# Portfolio-level risk, between the header and the stock cards
+RISK_TILE = CompiledTemplate("""
+<div style="flex: 1; background-color: #f3f4f6; padding: 12px; border-radius: 6px; text-align: center; border: 1px solid #e5e7eb;">
+    <span style="display: block; font-size: 11px; color: #6b7280; text-transform: uppercase; font-weight: bold; margin-bottom: 4px;">{label}</span>
+    <span style="font-size: 18px; font-weight: bold; color: #111827;">{value}</span>
+</div>
+""")
+
+RISK = CompiledTemplate("""
+<div style="background-color: #ffffff; border-radius: 8px; box-shadow: 0 4px 6px rgba(0,0,0,0.1); margin-bottom: 20px; padding: 25px;">
+    <h3 style="margin-top: 0; color: #374151; font-size: 16px; border-bottom: 2px solid #e5e7eb; padding-bottom: 8px;">Portfolio Risk</h3>
+    <div style="display: flex; gap: 10px; margin-bottom: 10px;">{row_1}</div>
+    <div style="display: flex; gap: 10px; margin-bottom: 15px;">{row_2}</div>
+    <p style="color: #6b7280; font-size: 12px; margin: 0;">{note}</p>
+</div>
+""")
+
+# The email wrapper with the Navy Header
+REPORT = CompiledTemplate("""
+<div style="font-family: 'Helvetica Neue', Helvetica, Arial, sans-serif; background-color: #f3f4f6; padding: 20px;">
+    <div style="max-width: 600px; margin: 0 auto;">
+
+        <div style="background-color: #111827; color: #ffffff; padding: 25px; text-align: center; border-radius: 8px; margin-bottom: 25px; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
+            <h1 style="margin: 0; font-size: 26px; font-weight: bold;">Naxera AI</h1>
+            <p style="margin: 5px 0 0 0; opacity: 0.8; font-size: 14px;">Daily Portfolio Wrap</p>
+
+            <div style="margin-top: 20px; padding-top: 20px; border-top: 1px solid #374151;">
+                <span style="font-size: 12px; font-weight: bold; letter-spacing: 1px; color: #9ca3af;">TOTAL VALUE</span><br/>
+                <span style="font-size: 40px; font-weight: bold; color: #4ade80;">${total_value}</span>
+            </div>
+        </div>
+
+        {risk}
+
+        {cards}
+
+        <div style="text-align: center; font-size: 12px; color: #6b7280; margin-top: 30px; padding: 20px; border-top: 1px solid #d1d5db;">
+            Generated by Naxera AI • Goldman Sachs Analysis Logic
+            <br><br>
+            <a href="{manage_url}" style="color: #9ca3af; text-decoration: underline;">Manage Portfolio or Unsubscribe</a>
+        </div>
+    </div>
+</div>
+""")
+
+
+def render_card_body(stock: dict, analysis: dict):
+    quant = stock['quant']
+    verdict = analysis.get('verdict', 'Hold').upper()
+    verdict_color = "#166534" if verdict == "BUY" else "#991b1b" if verdict == "SELL" else "#854d0e"
+    return CARD_BODY.render(
+        rsi=quant['rsi'],
+        sma_50=quant['sma_50'],
+        sma_200=quant['sma_200'],
+        quant_analysis=analysis.get('quant_analysis'),
+        summary=analysis.get('summary'),
+        price=f"{stock['price']:,.2f}",
+        target_mean_price=stock['target_mean_price'],
+        pe_ratio=stock['pe_ratio'],
+        verdict=verdict,
+        verdict_color=verdict_color,
+        rationale=analysis.get('rationale'),
+    )
+
+
+def _pct(value):
+    return f"{value * 100:.1f}%" if value is not None else "N/A"
+
+
+def render_risk(risk: dict):
+    """The Portfolio Risk panel, or nothing when no metrics could be computed."""
+    if not risk:
+        return ""
+    beta = risk.get("beta")
+    correlation = risk.get("avg_correlation")
+    row_1 = [
+        ("Volatility (Ann.)", _pct(risk["volatility"])),
+        ("Beta vs SPY", f"{beta:.2f}" if beta is not None else "N/A"),
+        ("Max Drawdown", _pct(risk["max_drawdown"])),
+    ]
+    row_2 = [
+        ("1-Day VaR (95%)", _pct(risk["var_95"])),
+        ("1-Day CVaR (95%)", _pct(risk["cvar_95"])),
+        ("Avg. Correlation", f"{correlation:.2f}" if correlation is not None else "N/A"),
+    ]
+    note = f"Based on {risk['days']} trading days of today's holdings."
+    if risk.get("correlations"):
+        a, b, rho = risk["correlations"][0]
+        note += f" Most correlated pair: {a} / {b} ({rho:.2f})."
+    if risk.get("coverage", 1) < 0.999:
+        note += f" Covers {_pct(risk['coverage'])} of portfolio value (holdings without price history are left out)."
+    return RISK.render(
+        row_1="".join(RISK_TILE.render(label=label, value=value) for label, value in row_1),
+        row_2="".join(RISK_TILE.render(label=label, value=value) for label, value in row_2),
+        note=note,
+    )
+
+
+class FragmentCache:
+    """
+    Run-level cache of rendered card bodies. The key covers every input of the
+    body, so all holders of a ticker share one fragment within a run.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._fragments = {}
+        self._lock = threading.Lock()
+
+    def card_body(self, stock: dict, analysis: dict):
+        inputs = [stock['quant'], stock['price'], stock['target_mean_price'], stock['pe_ratio'], analysis]
+        digest = hashlib.sha1(json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        key = (stock['ticker'].upper(), digest)
+        with self._lock:
+            if key in self._fragments:
+                self.hits += 1
+                tracer.count("cache.fragments.hit")
+                return self._fragments[key]
+        fragment = render_card_body(stock, analysis)
+        tracer.count("cache.fragments.miss")
+        with self._lock:
+            self.misses += 1
+            self._fragments[key] = fragment
+        return fragment
+
+
+def render_report(portfolio_data: list, analyses: dict, total_value: float, manage_url: str,
+                  fragments: FragmentCache = None, risk: dict = None):
+    """Assembles one user's email from the per-user headers and the shared card bodies."""
+    fragments = fragments or FragmentCache()
+    cards = []
+    for stock in portfolio_data:
+        cards.append(CARD_OPEN.render(
+            ticker=stock['ticker'], shares=stock['shares'], value=f"{stock['value']:,.2f}"
+        ))
+        cards.append(fragments.card_body(stock, analyses[stock['ticker']]))
+        cards.append(CARD_CLOSE)
+    return REPORT.render(
+        total_value=f"{total_value:,.2f}", risk=render_risk(risk), cards="".join(cards), manage_url=manage_url
+    )
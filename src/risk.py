@@ -0,0 +1,108 @@
+import math
+from functools import lru_cache
+
+import numpy as np
+
+from src.indicators import price_matrix
+
+BENCHMARK = "SPY"
+TRADING_DAYS = 252
+VAR_LEVEL = 0.95
+
+
+@lru_cache(maxsize=None)
+def _pairs(n: int):
+    """Row/column indices of the upper triangle of an n x n matrix, reused across portfolios of size n."""
+    return np.triu_indices(n, 1)
+
+
+class ReturnsMatrix:
+    """
+    Daily simple returns for every ticker in the run, aligned once into a
+    date x ticker array on the benchmark's trading calendar.
+
+    portfolio_risk() only gathers one user's columns and takes a weights-vector
+    product, so each extra user costs microseconds: nothing is re-downloaded or
+    re-aligned. Each column is built from that ticker's own closes (tickers on
+    other calendars, e.g. crypto, are carried to the benchmark's days), so a
+    portfolio's numbers never depend on which other tickers are in the run.
+    Today's weights are applied to the whole window, i.e. the metrics describe
+    how the current holdings would have behaved.
+    """
+
+    def __init__(self, histories: dict, benchmark: str = BENCHMARK):
+        close = price_matrix(histories, "Close")
+        if benchmark in close:
+            # Last close on or before each benchmark day, within each ticker's own history
+            calendar = close[benchmark].dropna().index
+            close = close.ffill(limit_area="inside").reindex(calendar)
+        returns = close.pct_change(fill_method=None).iloc[1:]
+        self.benchmark = benchmark
+        self.tickers = list(returns.columns)
+        self.columns = {t: i for i, t in enumerate(self.tickers)}
+        values = returns.to_numpy(dtype=float)
+        # Rows before a listing (or after the last bar) have no return for that ticker
+        self.valid = ~np.isnan(values)
+        self.returns = np.nan_to_num(values)
+        self.bench = self.columns.get(benchmark)
+
+    def portfolio_risk(self, values: dict):
+        """
+        Risk of a portfolio given as {ticker: market value}, measured over the
+        days on which every holding has a return. Holdings without a price
+        history are left out; `coverage` is the share of value measured.
+        Returns {} when nothing can be measured.
+        """
+        held = [(self.columns[t.upper()], v) for t, v in values.items() if t.upper() in self.columns and v and v > 0]
+        if not held:
+            return {}
+        idx = np.fromiter((i for i, _ in held), dtype=np.intp, count=len(held))
+        weights = np.fromiter((v for _, v in held), dtype=float, count=len(held))
+        measured = weights.sum()
+        weights /= measured
+
+        rows = self.valid[:, idx].all(axis=1)
+        if self.bench is not None:
+            rows &= self.valid[:, self.bench]
+        returns = self.returns[rows][:, idx] if not rows.all() else self.returns[:, idx]
+        days = len(returns)
+        if days < 2:
+            return {}
+
+        daily = returns @ weights
+        # Historical VaR/CVaR: the n-th worst day and the mean of the n worst days
+        n_tail = max(1, math.ceil((1 - VAR_LEVEL) * days))
+        tail = np.partition(daily, n_tail - 1)[:n_tail]
+        wealth = np.cumprod(1 + daily)
+        peak = np.maximum(np.maximum.accumulate(wealth), 1.0)
+
+        beta = None
+        if self.bench is not None:
+            bench = self.returns[rows, self.bench]
+            bench = bench - bench.mean()
+            variance = bench @ bench
+            beta = float(daily @ bench / variance) if variance > 0 else None
+
+        risk = {
+            "volatility": float(daily.std(ddof=1) * math.sqrt(TRADING_DAYS)),
+            "beta": beta,
+            "var_95": float(-tail.max()),
+            "cvar_95": float(-tail.mean()),
+            "max_drawdown": float((wealth / peak).min() - 1),
+            "avg_correlation": None,
+            "correlations": [],
+            "coverage": float(measured / sum(v for v in values.values() if v and v > 0)),
+            "days": days,
+        }
+        if len(idx) > 1:
+            centered = returns - returns.mean(axis=0)
+            norms = np.sqrt((centered ** 2).sum(axis=0))
+            # Unit-length centered columns: their Gram matrix is the correlation matrix
+            z = np.divide(centered, norms, out=np.zeros_like(centered), where=norms > 0)
+            corr = z.T @ z
+            upper = _pairs(len(idx))
+            names = [self.tickers[i] for i in idx]
+            pairs = sorted(zip(corr[upper].tolist(), upper[0].tolist(), upper[1].tolist()), reverse=True)
+            risk["avg_correlation"] = float(corr[upper].mean())
+            risk["correlations"] = [[names[i], names[j], rho] for rho, i, j in pairs]
+        return risk
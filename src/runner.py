@@ -0,0 +1,63 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src.agent import get_app, run_agent
+
+
+def _run_user(email: str, portfolio: list, resources: dict):
+    print(f"--- 🤖 Processing Portfolio for {email} ---")
+    inputs = {
+        "user_email": email,
+        "portfolio": portfolio,
+        "retry_count": 0
+    }
+    run_agent(inputs, **resources)
+    print(f"✅ Finished sending to {email}")
+
+
+def run_batch(user_portfolios: dict, concurrency: int = 4, **resources):
+    """
+    Runs every user's graph on a thread pool, at most `concurrency` at a time.
+
+    The graph is compiled once up front and shared; `resources` (market data,
+    caches, limiter) are passed to every run. A failing user is recorded and
+    never affects the others. Returns a summary dict.
+    """
+    get_app()
+    started = time.perf_counter()
+    succeeded, failed = [], {}
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="user") as pool:
+        futures = {
+            pool.submit(_run_user, email, portfolio, resources): email
+            for email, portfolio in user_portfolios.items()
+        }
+        for future in as_completed(futures):
+            email = futures[future]
+            try:
+                future.result()
+                succeeded.append(email)
+            except Exception as e:
+                print(f"❌ Failed to process {email}: {e}")
+                failed[email] = str(e)
+
+    return {
+        "users": len(user_portfolios),
+        "succeeded": succeeded,
+        "failed": failed,
+        "wall_time": time.perf_counter() - started,
+    }
+
+
+def print_summary(summary: dict):
+    print("\n--- 📋 Batch Summary ---")
+    print(f"Users:     {summary['users']}")
+    print(f"Succeeded: {len(summary['succeeded'])}")
+    if summary.get("skipped"):
+        print(f"Skipped:   {len(summary['skipped'])} (already delivered for this run date)")
+    print(f"Failed:    {len(summary['failed'])}")
+    for email, error in summary["failed"].items():
+        print(f"   ❌ {email}: {error}")
+    print(f"Wall time: {summary['wall_time']:.1f}s")
+    if summary.get("stages"):
+        print("   " + ", ".join(f"{name} {seconds:.1f}s" for name, seconds in summary["stages"].items()))
@@ -0,0 +1,204 @@
+"""
+Deterministic user partitioning so N workers can split one daily batch.
+
+    python main.py --shard-index 2 --shard-count 8      # one worker (e.g. a CI matrix job)
+    python -m src.sharding run --shards 4               # N local processes, then merge
+    python -m src.sharding merge manifests/*.json       # verify exactly-once coverage
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from datetime import date
+
+# Sums of digests are taken modulo this, so the universe fingerprint is order-free
+FINGERPRINT_MOD = 2 ** 128
+MANIFEST_DIR = "manifests"
+
+
+def email_digest(email: str):
+    """Stable across processes and Python versions (unlike hash()); also keeps emails out of manifests."""
+    return hashlib.sha256(email.strip().lower().encode("utf-8")).hexdigest()[:32]
+
+
+def shard_of(email: str, shard_count: int):
+    return int(email_digest(email), 16) % shard_count
+
+
+class Shard:
+    """
+    One worker's slice of the users: those whose email hashes to `index`
+    modulo `count`. select() filters the full portfolio stream and, on the
+    way, fingerprints every user it saw, which lets merge() check that all
+    shards partitioned the same set of users.
+    """
+
+    def __init__(self, index: int = 0, count: int = 1):
+        if count < 1 or not 0 <= index < count:
+            raise ValueError(f"shard index must be in [0, {count}), got {index}")
+        self.index = index
+        self.count = count
+        self.universe = 0
+        self.fingerprint = 0
+        self.assigned = 0
+
+    def owns(self, email: str):
+        return shard_of(email, self.count) == self.index
+
+    def select(self, portfolios):
+        """Yields the (email, portfolio) pairs that belong to this shard."""
+        for email, portfolio in portfolios:
+            digest = int(email_digest(email), 16)
+            self.universe += 1
+            self.fingerprint = (self.fingerprint + digest) % FINGERPRINT_MOD
+            if digest % self.count == self.index:
+                self.assigned += 1
+                yield email, portfolio
+
+    def default_manifest_path(self, run_date: str):
+        return os.path.join(MANIFEST_DIR, f"{run_date}-shard-{self.index:03d}-of-{self.count:03d}.json")
+
+    def write_manifest(self, path: str, summary: dict, run_date: str):
+        """Records which users this shard processed (as digests) and how it went."""
+        manifest = {
+            "run_date": run_date,
+            "shard_index": self.index,
+            "shard_count": self.count,
+            "universe": self.universe,
+            "fingerprint": format(self.fingerprint, "x"),
+            "assigned": self.assigned,
+            "succeeded": sorted(email_digest(e) for e in summary["succeeded"]),
+            "failed": {email_digest(e): error for e, error in summary["failed"].items()},
+            "stages": summary.get("stages", {}),
+        }
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+
+def merge(manifests: list):
+    """
+    Checks a set of shard manifests for exactly-once coverage. Returns a report
+    dict whose "problems" list is empty when every user of the run was handled
+    by exactly one shard.
+    """
+    problems = []
+    if not manifests:
+        return {"problems": ["no manifests"], "users": 0, "succeeded": 0, "failed": {}}
+
+    first = manifests[0]
+    for key in ("run_date", "shard_count", "universe", "fingerprint"):
+        values = {m[key] for m in manifests}
+        if len(values) > 1:
+            problems.append(f"shards disagree on {key}: {sorted(map(str, values))}")
+
+    indexes = [m["shard_index"] for m in manifests]
+    missing = sorted(set(range(first["shard_count"])) - set(indexes))
+    if missing:
+        problems.append(f"missing shards: {missing}")
+    repeated = sorted({i for i in indexes if indexes.count(i) > 1})
+    if repeated:
+        problems.append(f"shards reported more than once: {repeated}")
+
+    owner = {}
+    fingerprint = 0
+    for m in manifests:
+        processed = m["succeeded"] + list(m["failed"])
+        if len(processed) != m["assigned"]:
+            problems.append(f"shard {m['shard_index']} processed {len(processed)} of {m['assigned']} assigned users")
+        for digest in processed:
+            if digest in owner:
+                problems.append(f"user {digest} processed by shards {owner[digest]} and {m['shard_index']}")
+                continue
+            owner[digest] = m["shard_index"]
+            fingerprint = (fingerprint + int(digest, 16)) % FINGERPRINT_MOD
+            if int(digest, 16) % m["shard_count"] != m["shard_index"]:
+                problems.append(f"user {digest} processed by shard {m['shard_index']}, which does not own it")
+
+    if len(owner) != first["universe"] or format(fingerprint, "x") != first["fingerprint"]:
+        problems.append(f"covered {len(owner)} users, expected {first['universe']} (fingerprint mismatch)")
+
+    failed = {}
+    for m in manifests:
+        failed.update(m["failed"])
+    return {
+        "problems": problems,
+        "users": len(owner),
+        "succeeded": sum(len(m["succeeded"]) for m in manifests),
+        "failed": failed,
+    }
+
+
+def load_manifests(patterns):
+    paths = sorted({p for pattern in patterns for p in glob.glob(pattern)})
+    manifests = []
+    for path in paths:
+        with open(path) as f:
+            manifests.append(json.load(f))
+    return manifests
+
+
+def print_report(report: dict):
+    print("\n--- 🧮 Shard Merge ---")
+    print(f"Users:     {report['users']}")
+    print(f"Succeeded: {report['succeeded']}")
+    print(f"Failed:    {len(report['failed'])}")
+    for digest, error in report["failed"].items():
+        print(f"   ❌ {digest}: {error}")
+    if report["problems"]:
+        for problem in report["problems"]:
+            print(f"⚠️ {problem}")
+    else:
+        print("✅ Every user was covered exactly once.")
+
+
+def run_local(shards: int, main_args: list, manifest_dir: str = MANIFEST_DIR):
+    """Runs `shards` copies of main.py side by side on this machine, then merges their manifests."""
+    run_date = date.today().isoformat()
+    paths = [os.path.join(manifest_dir, f"{run_date}-shard-{i:03d}-of-{shards:03d}.json") for i in range(shards)]
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+    main_py = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+    workers = [
+        subprocess.Popen([
+            sys.executable, main_py, *main_args,
+            "--shard-index", str(i), "--shard-count", str(shards), "--manifest", path,
+        ])
+        for i, path in enumerate(paths)
+    ]
+    codes = [worker.wait() for worker in workers]
+    for i, code in enumerate(codes):
+        if code:
+            print(f"❌ Shard {i} exited with status {code}")
+
+    report = merge(load_manifests(paths))
+    print_report(report)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run or verify a sharded Naxera AI batch.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run N shards as local processes and merge them")
+    run_parser.add_argument("--shards", type=int, default=os.cpu_count())
+    run_parser.add_argument("--manifest-dir", default=MANIFEST_DIR)
+    run_parser.add_argument("main_args", nargs=argparse.REMAINDER, help="Passed through to main.py (after --)")
+
+    merge_parser = commands.add_parser("merge", help="Verify shard manifests cover every user exactly once")
+    merge_parser.add_argument("manifests", nargs="+", help="Manifest files or glob patterns")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        main_args = [a for a in args.main_args if a != "--"]
+        report = run_local(args.shards, main_args, args.manifest_dir)
+    else:
+        report = merge(load_manifests(args.manifests))
+        print_report(report)
+    sys.exit(1 if report["problems"] else 0)
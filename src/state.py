@@ -7,7 +7,8 @@ class AgentState(TypedDict):
     news_results: List[str]              # Internal: Broad market news
     portfolio_data: List[Dict[str, Any]] # Internal: Financials for each stock
     total_value: float                   # Internal: Sum of all shares * price
-    chart_paths: List[str]               # Internal: List of image files to attach
+    risk: Dict[str, Any]                 # Internal: Portfolio volatility, beta, VaR/CVaR, drawdown, correlation
+    charts: List[Dict[str, str]]         # Internal: [{'filename', 'content' (base64 PNG)}] to attach
     
     final_report: str                    # Output: HTML email body
     retry_count: int
\ No newline at end of file
@@ -0,0 +1,12 @@
+import os
+
+# Everything the batch job persists between runs lives under one directory,
+# so GitHub Actions can restore/save it as a single cache entry.
+DEFAULT_DATA_DIR = ".naxera_cache"
+
+
+def data_path(name: str):
+    """Returns the path of `name` inside the data directory, creating the directory."""
+    data_dir = os.getenv("NAXERA_DATA_DIR", DEFAULT_DATA_DIR)
+    os.makedirs(data_dir, exist_ok=True)
+    return os.path.join(data_dir, name)
@@ -0,0 +1,58 @@
+from itertools import groupby
+
+# Only what the pipeline reads; `uuid` doubles as the tie-breaker for paging
+COLUMNS = "email,ticker,shares,uuid"
+DEFAULT_PAGE_SIZE = 1000
+
+
+def _page(supabase, page_size: int, after_email: str = None, email: str = None, after_uuid: str = None):
+    """One keyset page ordered by (email, uuid): never OFFSET, so every page costs the same."""
+    query = supabase.table("subscriptions").select(COLUMNS).eq("active", True)
+    if email is not None:
+        query = query.eq("email", email)
+    if after_email is not None:
+        query = query.gt("email", after_email)
+    if after_uuid is not None:
+        query = query.gt("uuid", after_uuid)
+    return query.order("email").order("uuid").limit(page_size).execute().data or []
+
+
+def _holding(row: dict):
+    return {"ticker": row["ticker"], "shares": float(row["shares"]), "uuid": row.get("uuid")}
+
+
+def iter_portfolios(supabase, page_size: int = DEFAULT_PAGE_SIZE):
+    """
+    Yields (email, [{'ticker', 'shares', 'uuid'}, ...]) for every user with
+    ACTIVE subscriptions, one complete portfolio at a time, in email order.
+
+    Rows are read in keyset-paginated pages of `page_size`. A full page may end
+    part-way through a user, so that user is held back and the next page starts
+    from them again; a user with more rows than a whole page is finished with
+    their own uuid-keyed pages. Memory stays bounded by one page.
+    """
+    after_email = None
+    while True:
+        rows = _page(supabase, page_size, after_email=after_email)
+        users = [(email, [_holding(r) for r in group]) for email, group in groupby(rows, key=lambda r: r["email"])]
+        if len(rows) < page_size:
+            yield from users
+            return
+
+        if len(users) > 1:
+            # The last user may continue on the next page: re-read them from there
+            yield from users[:-1]
+            after_email = users[-2][0]
+            continue
+
+        # One user filled the whole page: page through the rest of their rows
+        email, portfolio = users[0]
+        last_uuid = rows[-1].get("uuid")
+        while True:
+            more = _page(supabase, page_size, email=email, after_uuid=last_uuid)
+            portfolio.extend(_holding(r) for r in more)
+            if len(more) < page_size:
+                break
+            last_uuid = more[-1].get("uuid")
+        yield email, portfolio
+        after_email = email
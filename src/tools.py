@@ -1,20 +1,28 @@
-import yfinance as yf
 import os
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+import base64
+import io
 from datetime import timedelta
 
+from src.tracing import tracer
+
 # ... (keep your existing get_financial_metrics function) ...
 
-def generate_stock_chart(ticker: str):
+def generate_stock_chart(ticker: str, hist=None):
     """
-    Generates a chart for the LAST 24 HOURS of trading data.
+    Generates a chart for the LAST 24 HOURS of trading data and returns it as PNG bytes.
+    Pass `hist` to reuse 30m bars that were already fetched for this run.
     """
+    # matplotlib is only loaded by the processes that actually draw charts
+    import matplotlib.dates as mdates
+    from matplotlib.figure import Figure
+
     try:
-        stock = yf.Ticker(ticker)
-        # We fetch 5 days to be safe (in case of weekends/holidays)
-        # Interval '30m' is good for a 24h view (48 bars)
-        hist = stock.history(period="5d", interval="30m")
+        if hist is None:
+            import yfinance as yf
+            stock = yf.Ticker(ticker)
+            # We fetch 5 days to be safe (in case of weekends/holidays)
+            # Interval '30m' is good for a 24h view (48 bars)
+            hist = stock.history(period="5d", interval="30m")
         
         if hist.empty:
             print("⚠️ No price history found.")
@@ -34,9 +42,9 @@ def generate_stock_chart(ticker: str):
         if subset.empty:
             return None
 
-        # 3. Setup the Plot
-        plt.switch_backend('Agg') 
-        plt.figure(figsize=(10, 5))
+        # 3. Setup the Plot (a standalone Figure: no pyplot global state, safe in any thread)
+        fig = Figure(figsize=(10, 5))
+        ax = fig.subplots()
         
         # Color Logic (Green if it ended higher than it started)
         start_price = subset['Open'].iloc[0]
@@ -44,36 +52,41 @@ def generate_stock_chart(ticker: str):
         color = '#166534' if end_price >= start_price else '#991b1b' # Dark Green / Dark Red
         
         # Plot Line
-        plt.plot(subset.index, subset['Close'], color=color, linewidth=2)
+        ax.plot(subset.index, subset['Close'], color=color, linewidth=2)
         
         # Fill area under line for a "Robinhood" look
-        plt.fill_between(subset.index, subset['Close'], min(subset['Close']), color=color, alpha=0.1)
+        ax.fill_between(subset.index, subset['Close'], min(subset['Close']), color=color, alpha=0.1)
         
         # Formatting Time Axis
-        plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
-        plt.title(f"{ticker} • Last 24 Hours", fontsize=14, fontweight='bold', color='#333')
-        plt.grid(True, linestyle='--', alpha=0.3)
-        plt.xticks(rotation=0)
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
+        ax.set_title(f"{ticker} • Last 24 Hours", fontsize=14, fontweight='bold', color='#333')
+        ax.grid(True, linestyle='--', alpha=0.3)
+        ax.tick_params(axis='x', labelrotation=0)
         
         # Clean up borders
-        plt.gca().spines['top'].set_visible(False)
-        plt.gca().spines['right'].set_visible(False)
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
         
-        # 4. Save
-        filename = f"{ticker}_chart.png"
-        plt.savefig(filename, bbox_inches='tight')
-        plt.close()
+        # 4. Render straight to memory
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', bbox_inches='tight')
         
-        print(f"📈 Chart generated (24h window): {filename}")
-        return filename
+        print(f"📈 Chart generated (24h window): {ticker}")
+        return buffer.getvalue()
         
     except Exception as e:
         print(f"❌ Failed to generate chart: {e}")
         return None
 
-import resend
+def encode_attachment(content):
+    """Resend takes attachment content as a base64 string; bytes are encoded here."""
+    if isinstance(content, (bytes, bytearray)):
+        return base64.b64encode(content).decode("ascii")
+    return content
 
 def send_email(to: str, subject: str, body: str, attachments=None):
+    import resend
+
     try:
         resend.api_key = os.getenv("RESEND_API_KEY")
         
@@ -88,22 +101,16 @@ def send_email(to: str, subject: str, body: str, attachments=None):
             "html": body,
         }
 
-        # Handle attachments specifically for Resend
+        # Attachments: [{"filename": ..., "content": PNG bytes or base64 str}]
         if attachments:
-            resend_attachments = []
-            for filepath in attachments:
-                if os.path.exists(filepath):
-                    with open(filepath, "rb") as f:
-                        file_data = list(f.read()) # Resend accepts a list of bytes
-                    resend_attachments.append({
-                        "filename": os.path.basename(filepath),
-                        "content": file_data
-                    })
-            if resend_attachments:
-                params["attachments"] = resend_attachments
+            params["attachments"] = [
+                {"filename": a["filename"], "content": encode_attachment(a["content"])}
+                for a in attachments
+            ]
 
         # Send the email
-        email_response = resend.Emails.send(params)
+        with tracer.span("resend.send"):
+            email_response = resend.Emails.send(params)
         print(f"📧 Email sent to {to} via Resend! ID: {email_response}")
         return True
         
@@ -115,9 +122,12 @@ def get_financial_metrics(ticker: str):
     """
     Fetches key financial data using yfinance.
     """
+    import yfinance as yf
+
     try:
         stock = yf.Ticker(ticker)
         info = stock.info
+        summary = info.get("longBusinessSummary") # None for funds, ETFs and some small caps
         
         # We only want the most important data
         financial_data = {
@@ -126,7 +136,7 @@ def get_financial_metrics(ticker: str):
             "pe_ratio": info.get("trailingPE"),
             "target_mean_price": info.get("targetMeanPrice"),
             "recommendation": info.get("recommendationKey"), # e.g., 'buy', 'hold'
-            "company_summary": info.get("longBusinessSummary")[:500] + "..." # First 500 chars
+            "company_summary": summary[:500] + "..." if summary else None # First 500 chars
         }
         return financial_data
     except Exception as e:
@@ -0,0 +1,201 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+# Upper bounds (ms) of the latency histogram buckets in the run summary
+BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000, 30000, float("inf"))
+
+
+class _NoopSpan:
+    """Handed out while tracing is off: entering, exiting and set() cost nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    def __init__(self, tracer, name: str, attrs: dict):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration_ms = (time.perf_counter() - self._t0) * 1000
+        self.tracer._finish(self, duration_ms, None if exc is None else f"{exc_type.__name__}: {exc}")
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    """
+    Run instrumentation: spans for graph nodes and external calls, plus named
+    counters (retries, cache hits/misses) and token usage.
+
+    Every finished span is appended to a JSON-lines trace file; summary() folds
+    everything into per-name latency histograms. When disabled, span() returns
+    a shared no-op object and count() returns immediately.
+    """
+
+    def __init__(self, path: str = None):
+        self.enabled = False
+        self.path = None
+        self._file = None
+        self._lock = threading.Lock()
+        self.reset()
+        if path:
+            self.enable(path)
+
+    def reset(self):
+        self.durations = defaultdict(list)
+        self.errors = Counter()
+        self.counters = Counter()
+        self.tokens = Counter()
+
+    def enable(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "a", buffering=1)
+        self.enabled = True
+
+    def close(self):
+        if self._file:
+            self._file.close()
+        self._file = None
+        self.enabled = False
+
+    def span(self, name: str, **attrs):
+        if not self.enabled:
+            return _NOOP
+        return _Span(self, name, attrs)
+
+    def observe(self, name: str, duration_ms: float, **attrs):
+        """Records a duration measured elsewhere (e.g. inside a worker process) as a span."""
+        if not self.enabled:
+            return
+        span = _Span(self, name, attrs)
+        span.started = time.time() - duration_ms / 1000
+        self._finish(span, duration_ms, None)
+
+    def count(self, name: str, n: int = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] += n
+
+    def add_tokens(self, name: str, usage: dict):
+        """Accumulates an LLM usage dict ({'input_tokens', 'output_tokens', ...}) under `name`."""
+        if not self.enabled or not usage:
+            return
+        with self._lock:
+            for key in ("input_tokens", "output_tokens", "total_tokens"):
+                self.tokens[f"{name}.{key}"] += usage.get(key, 0) or 0
+
+    def _finish(self, span: _Span, duration_ms: float, error: str):
+        event = {
+            "type": "span",
+            "name": span.name,
+            "start": round(span.started, 6),
+            "duration_ms": round(duration_ms, 3),
+            "ok": error is None,
+            "thread": threading.current_thread().name,
+        }
+        if error:
+            event["error"] = error
+        if span.attrs:
+            event["attrs"] = span.attrs
+        line = json.dumps(event, default=str)
+        with self._lock:
+            self.durations[span.name].append(duration_ms)
+            if error:
+                self.errors[span.name] += 1
+            if self._file:
+                self._file.write(line + "\n")
+
+    # --- Run summary ---
+    def summary(self):
+        spans = {}
+        for name, values in sorted(self.durations.items()):
+            ordered = sorted(values)
+            histogram = Counter(next(b for b in BUCKETS_MS if v <= b) for v in ordered)
+            spans[name] = {
+                "count": len(ordered),
+                "errors": self.errors[name],
+                "total_ms": round(sum(ordered), 1),
+                "p50_ms": round(ordered[len(ordered) // 2], 1),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+                "max_ms": round(ordered[-1], 1),
+                "histogram": {f"<={b:g}ms": histogram[b] for b in BUCKETS_MS if histogram[b]},
+            }
+
+        ratios = {}
+        for name in self.counters:
+            if name.endswith(".hit"):
+                base = name[: -len(".hit")]
+                total = self.counters[name] + self.counters[f"{base}.miss"]
+                ratios[base] = round(self.counters[name] / total, 3) if total else 0.0
+
+        return {
+            "spans": spans,
+            "counters": dict(sorted(self.counters.items())),
+            "cache_hit_ratio": ratios,
+            "tokens": dict(sorted(self.tokens.items())),
+        }
+
+    def write_summary(self):
+        summary = self.summary()
+        if self._file:
+            with self._lock:
+                self._file.write(json.dumps({"type": "summary", **summary}) + "\n")
+        return summary
+
+    def format_summary(self, summary: dict = None):
+        summary = summary or self.summary()
+        lines = [f"{'span':<24}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'total s':>10}"]
+        for name, s in summary["spans"].items():
+            lines.append(
+                f"{name:<24}{s['count']:>7}{s['errors']:>8}{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}"
+                f"{s['max_ms']:>10.1f}{s['total_ms'] / 1000:>10.2f}"
+            )
+        for name, value in summary["counters"].items():
+            lines.append(f"{name:<24}{value:>7}")
+        for name, ratio in summary["cache_hit_ratio"].items():
+            lines.append(f"{name + ' hit ratio':<24}{ratio:>7.1%}")
+        for name, value in summary["tokens"].items():
+            lines.append(f"{name:<24}{value:>7}")
+        return "\n".join(lines)
+
+
+# Process-wide tracer; NAXERA_TRACE=<path.jsonl> turns it on from the start
+tracer = Tracer(os.getenv("NAXERA_TRACE") or None)
+
+
+def traced(name: str):
+    """Decorator form of tracer.span() for graph nodes and helpers."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return fn(*args, **kwargs)
+            with tracer.span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,66 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from src.analyst import Analyst, RateLimiter
+from src.llm_cache import AnalysisCache
+
+ANSWER = {"quant_analysis": "Trend is up.", "summary": "Fine.", "verdict": "Buy", "rationale": "Momentum."}
+
+
+class SlowLLM:
+    """Answers after a short delay and records which tickers it was asked about."""
+
+    def __init__(self, answer=ANSWER):
+        self.answer = answer
+        self.prompts = []
+
+    async def ainvoke(self, messages):
+        self.prompts.append(messages[-1].content)
+        await asyncio.sleep(0.05)
+
+        class Reply:
+            content = json.dumps(self.answer)
+        return Reply()
+
+
+def stock(ticker):
+    return {"ticker": ticker, "price": 100.0, "pe_ratio": 20, "quant": {"sma_50": "$1", "sma_200": "$2", "rsi": 50}}
+
+
+def run_users(llm, cache, portfolios):
+    limiter = RateLimiter(rpm=10_000, tpm=10_000_000)
+    analysts = [Analyst(llm, "model", 0, cache=cache, limiter=limiter) for _ in portfolios]
+    with ThreadPoolExecutor(len(portfolios)) as pool:
+        return list(pool.map(lambda a, p: a.run([stock(t) for t in p], "news"), analysts, portfolios))
+
+
+def test_concurrent_users_share_one_request_per_prompt(tmp_path):
+    llm = SlowLLM()
+    cache = AnalysisCache(str(tmp_path / "llm.sqlite"))
+    results = run_users(llm, cache, [["AAA", "BBB"], ["AAA", "CCC"], ["BBB", "AAA"], ["AAA"]])
+
+    assert len(llm.prompts) == 3
+    assert all(analysis == ANSWER for user in results for analysis in user.values())
+    assert results[3] == {"AAA": ANSWER}
+
+
+def test_waiters_get_the_fallback_without_caching_it(tmp_path):
+    llm = SlowLLM(answer={"not": "an analysis"})
+    cache = AnalysisCache(str(tmp_path / "llm.sqlite"))
+    results = run_users(llm, cache, [["AAA"], ["AAA"]])
+
+    assert len(llm.prompts) == 1
+    assert [user["AAA"]["verdict"] for user in results] == ["Hold", "Hold"]
+    assert cache.get(AnalysisCache.key("model", 0, llm.prompts[0])) is None
+
+
+def test_a_fallback_is_never_cached(tmp_path):
+    llm = SlowLLM(answer={"not": "an analysis"})
+    cache = AnalysisCache(str(tmp_path / "llm.sqlite"))
+    assert run_users(llm, cache, [["AAA"]])[0]["AAA"]["verdict"] == "Hold"
+    assert cache.get(AnalysisCache.key("model", 0, llm.prompts[0])) is None
+
+    # The next run asks again instead of reusing the placeholder
+    run_users(llm, cache, [["AAA"]])
+    assert len(llm.prompts) == 2
@@ -0,0 +1,59 @@
+from typing import TypedDict
+
+from langgraph.graph import END, StateGraph
+
+from src.checkpoints import RunCheckpoints
+
+
+class State(TypedDict):
+    steps: list
+
+
+def make_app(checkpoints, fail_at=None):
+    def step(name):
+        def node(state):
+            if name == fail_at:
+                raise RuntimeError(f"{name} failed")
+            return {"steps": state["steps"] + [name]}
+        return node
+
+    graph = StateGraph(State)
+    for name in ("fetch", "analyze", "publish"):
+        graph.add_node(name, step(name))
+    graph.set_entry_point("fetch")
+    graph.add_edge("fetch", "analyze")
+    graph.add_edge("analyze", "publish")
+    graph.add_edge("publish", END)
+    return graph.compile(checkpointer=checkpoints.saver)
+
+
+def test_failed_user_resumes_at_the_failed_node(tmp_path):
+    checkpoints = RunCheckpoints(str(tmp_path / "cp.sqlite"), run_date="2026-03-02")
+    email = "someone@test.dev"
+    config = checkpoints.config(email)
+    assert checkpoints.progress(make_app(checkpoints), email) is None
+
+    try:
+        make_app(checkpoints, fail_at="analyze").invoke({"steps": []}, config)
+    except RuntimeError:
+        pass
+    assert checkpoints.progress(make_app(checkpoints), email) == ("analyze",)
+
+    # The resumed run does not repeat "fetch"
+    result = make_app(checkpoints).invoke(None, config)
+    assert result["steps"] == ["fetch", "analyze", "publish"]
+    assert checkpoints.progress(make_app(checkpoints), email) == ()
+
+
+def test_threads_are_per_run_date_and_old_dates_are_pruned(tmp_path):
+    path = str(tmp_path / "cp.sqlite")
+    old = RunCheckpoints(path, run_date="2026-03-01")
+    make_app(old).invoke({"steps": []}, old.config("someone@test.dev"))
+    old.close()
+
+    today = RunCheckpoints(path, run_date="2026-03-02")
+    assert today.progress(make_app(today), "someone@test.dev") is None
+    today.close()
+
+    later = RunCheckpoints(path, run_date="2026-03-09", keep_days=3)
+    assert later._conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0] == 0
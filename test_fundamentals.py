@@ -0,0 +1,80 @@
+import pytest
+
+import src.fundamentals as fundamentals
+from src.fundamentals import Fundamentals, FundamentalsCache, InvalidSymbol
+
+INFO = {
+    "currentPrice": 100.0, "trailingEps": 4.0, "sharesOutstanding": 1000, "trailingPE": 24.9,
+    "marketCap": 99000, "targetMeanPrice": 120.0, "recommendationKey": "buy",
+    "longBusinessSummary": "x" * 600, "quoteType": "EQUITY",
+}
+
+
+@pytest.fixture
+def yahoo(monkeypatch):
+    """Counts and answers the two Yahoo endpoints; tests tweak `state` to change the replies."""
+    state = {"info": dict(INFO), "price": 110.0, "info_calls": 0, "quote_calls": 0, "error": None}
+
+    def fetch_info(ticker):
+        state["info_calls"] += 1
+        if state["error"]:
+            raise state["error"]
+        return state["info"], state["info"].get("currentPrice")
+
+    def fetch_quote(ticker):
+        state["quote_calls"] += 1
+        if state["error"]:
+            raise state["error"]
+        return state["price"]
+
+    monkeypatch.setattr(fundamentals, "_fetch_info", fetch_info)
+    monkeypatch.setattr(fundamentals, "_fetch_quote", fetch_quote)
+    return state
+
+
+def make(tmp_path, **kwargs):
+    return Fundamentals(FundamentalsCache(str(tmp_path / "f.sqlite")), **kwargs)
+
+
+def test_only_the_stale_field_class_is_refetched(tmp_path, yahoo):
+    first = make(tmp_path).metrics("abc")
+    assert first["current_price"] == 100.0
+    assert first["pe_ratio"] == 25.0
+    assert first["company_summary"] == "x" * 500 + "..."
+    assert yahoo["info_calls"] == 1
+
+    # Next run, price expired but estimates and profile are fresh: only the quote is fetched
+    later = make(tmp_path, ttls={"quote": 0}).metrics("ABC")
+    assert (yahoo["info_calls"], yahoo["quote_calls"]) == (1, 1)
+    assert later["current_price"] == 110.0
+    assert later["pe_ratio"] == 27.5
+    assert later["market_cap"] == 110000
+    assert later["target_mean_price"] == 120.0
+
+    # Everything fresh: no requests at all
+    make(tmp_path).metrics("ABC")
+    assert (yahoo["info_calls"], yahoo["quote_calls"]) == (1, 1)
+
+
+def test_missing_business_summary_does_not_crash(tmp_path, yahoo):
+    yahoo["info"]["longBusinessSummary"] = None
+    assert make(tmp_path).metrics("ETF")["company_summary"] is None
+
+
+def test_invalid_symbols_are_negatively_cached(tmp_path, yahoo):
+    yahoo["error"] = InvalidSymbol("404 Quote not found")
+    assert make(tmp_path).metrics("GONE") == {}
+    assert make(tmp_path).metrics("GONE") == {}
+    assert yahoo["info_calls"] == 1
+
+    # Once the negative entry expires the symbol is tried again
+    yahoo["error"] = None
+    assert make(tmp_path, negative_ttl=0).metrics("GONE")["current_price"] == 100.0
+
+
+def test_stored_values_are_served_when_a_refresh_fails(tmp_path, yahoo):
+    make(tmp_path).metrics("ABC")
+    yahoo["error"] = ConnectionError("rate limited")
+    stale = make(tmp_path, ttls={"quote": 0, "estimates": 0}).metrics("ABC")
+    assert stale["current_price"] == 100.0
+    assert stale["recommendation"] == "buy"
@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Cumulative `import main` time, measured with python -X importtime. Locally it
+# is ~60 ms; the budget leaves room for slow CI runners but not for an eager
+# langgraph/pandas import (which alone costs well over a second).
+IMPORT_BUDGET_MS = 300
+
+HEAVY_MODULES = (
+    "langgraph", "langchain_core", "langchain_groq", "tavily", "supabase",
+    "yfinance", "pandas", "numpy", "matplotlib", "resend",
+)
+
+
+def run_python(*args):
+    # No API keys: importing must not construct any client
+    env = {k: v for k, v in os.environ.items() if not k.endswith("_API_KEY")}
+    return subprocess.run(
+        [sys.executable, *args], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+
+
+def test_import_main_stays_within_budget():
+    # Best of three, so one cold disk cache doesn't fail the suite
+    timings = []
+    for _ in range(3):
+        stderr = run_python("-X", "importtime", "-c", "import main").stderr
+        line = next(line for line in stderr.splitlines() if line.rstrip().endswith("| main"))
+        timings.append(int(line.split("|")[1]) / 1000)
+    assert min(timings) < IMPORT_BUDGET_MS, f"import main took {min(timings):.0f} ms"
+
+
+def test_heavy_dependencies_load_lazily():
+    code = (
+        "import sys, main, src.runner, src.charts, src.checkpoints\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    assert run_python("-c", code).stdout.strip() == ""
@@ -0,0 +1,115 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from src.indicators import (
+    EMAState, SMAState, WilderRSIState, compute_indicators, ema, price_matrix, sma, wilder_rsi,
+)
+
+
+def make_histories(n_tickers=5, n_days=260, seed=7):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2025-01-01", periods=n_days)
+    histories = {}
+    for i in range(n_tickers):
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n_days)))
+        spread = close * rng.uniform(0.005, 0.02, n_days)
+        histories[f"T{i}"] = pd.DataFrame(
+            {"Open": close, "High": close + spread, "Low": close - spread, "Close": close}, index=dates
+        )
+    # A young listing with too little history for the 200-day average
+    histories["NEW"] = histories["T0"].iloc[-60:] * 0.5
+    return histories
+
+
+def reference_wilder_rsi(close_px, period=14):
+    """Textbook per-ticker loop: seed with a simple mean, then Wilder's recursion."""
+    delta = close_px.diff().dropna().to_numpy()
+    gains, losses = np.clip(delta, 0, None), np.clip(-delta, 0, None)
+    avg_gain, avg_loss = gains[:period].mean(), losses[:period].mean()
+    for g, l in zip(gains[period:], losses[period:]):
+        avg_gain = (avg_gain * (period - 1) + g) / period
+        avg_loss = (avg_loss * (period - 1) + l) / period
+    return 100 - 100 / (1 + avg_gain / avg_loss)
+
+
+def test_sma_matches_per_ticker_rolling():
+    histories = make_histories()
+    records = compute_indicators(price_matrix(histories))
+    for ticker, hist in histories.items():
+        close_px = hist["Close"]
+        # Same math the data collector used per ticker before the indicator engine
+        expected_50 = close_px.rolling(window=50).mean().iloc[-1]
+        assert np.isclose(records[ticker]["sma_50"], expected_50)
+        if len(close_px) >= 200:
+            assert np.isclose(records[ticker]["sma_200"], close_px.rolling(window=200).mean().iloc[-1])
+        else:
+            assert records[ticker]["sma_200"] is None
+
+
+def test_mixed_calendars_do_not_affect_each_other():
+    histories = make_histories()
+    alone = compute_indicators(price_matrix({"T0": histories["T0"]}))["T0"]
+
+    # Crypto trades every day; a second stock is missing one bar
+    days = pd.date_range("2025-01-01", periods=380)
+    btc = pd.DataFrame({"Close": 30000 + np.arange(380.0) * np.where(np.arange(380) % 3, 1, -1)}, index=days)
+    gappy = histories["T1"].drop(histories["T1"].index[-30])
+    mixed = compute_indicators(price_matrix({"T0": histories["T0"], "BTC-USD": btc, "T1": gappy}))
+
+    assert mixed["T0"] == alone
+    assert mixed["BTC-USD"]["sma_200"] is not None
+    assert np.isclose(mixed["BTC-USD"]["sma_200"], btc["Close"].iloc[-200:].mean())
+    assert np.isclose(mixed["T1"]["sma_50"], gappy["Close"].iloc[-50:].mean())
+
+
+def test_rsi_matches_per_ticker_wilder():
+    histories = make_histories()
+    records = compute_indicators(price_matrix(histories))
+    for ticker, hist in histories.items():
+        assert np.isclose(records[ticker]["rsi_14"], reference_wilder_rsi(hist["Close"]))
+
+
+def test_rsi_is_100_without_losses():
+    close = pd.DataFrame({"UP": np.arange(1.0, 40.0)})
+    assert wilder_rsi(close).iloc[-1, 0] == 100
+
+
+def test_full_record_for_every_ticker():
+    histories = make_histories()
+    records = compute_indicators(
+        price_matrix(histories), price_matrix(histories, "High"), price_matrix(histories, "Low")
+    )
+    assert set(records) == set(histories)
+    t0 = records["T0"]
+    for field in ("ema_20", "macd", "macd_signal", "macd_hist", "bb_upper", "bb_mid", "bb_lower", "atr_14"):
+        assert t0[field] is not None
+    assert t0["bb_lower"] < t0["bb_mid"] < t0["bb_upper"]
+    assert np.isclose(t0["macd_hist"], t0["macd"] - t0["macd_signal"])
+    assert t0["atr_14"] > 0
+
+
+def stream(state, values):
+    return [state.update(v) for v in values]
+
+
+def test_incremental_states_match_batch_indicators():
+    close = price_matrix(make_histories(n_tickers=1, n_days=600))["T0"]
+    for state, batch in (
+        (SMAState(50), sma(close, 50)),
+        (EMAState(20), ema(close, 20)),
+        (WilderRSIState(14), wilder_rsi(close, 14)),
+    ):
+        got = np.array([np.nan if v is None else v for v in stream(state, close)])
+        assert np.allclose(got, batch.to_numpy(), equal_nan=True), type(state).__name__
+
+
+def test_incremental_states_resume_from_json():
+    values = make_histories(n_tickers=1, n_days=300)["T0"]["Close"].tolist()
+    for make in (lambda: SMAState(50), lambda: EMAState(20), lambda: WilderRSIState(14)):
+        straight = stream(make(), values)
+        first = make()
+        stream(first, values[:137])
+        resumed = type(first).from_dict(json.loads(json.dumps(first.to_dict())))
+        assert stream(resumed, values[137:]) == straight[137:]
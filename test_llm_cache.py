@@ -0,0 +1,47 @@
+import src.llm_cache
+from src.llm_cache import AnalysisCache
+
+ANSWER = {"verdict": "Buy"}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def cache_at(tmp_path, monkeypatch, **kwargs):
+    clock = Clock()
+    monkeypatch.setattr(src.llm_cache.time, "time", clock)
+    return AnalysisCache(str(tmp_path / "llm.sqlite"), **kwargs), clock
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    cache, clock = cache_at(tmp_path, monkeypatch, ttl=60)
+    cache.put("k", ANSWER)
+    clock.now += 59
+    assert cache.get("k") == ANSWER
+    clock.now += 2
+    assert cache.get("k") is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    cache, clock = cache_at(tmp_path, monkeypatch, max_entries=2)
+    for key in ("a", "b"):
+        cache.put(key, ANSWER)
+        clock.now += 1
+    cache.get("a")  # "b" is now the least recently used
+    clock.now += 1
+    cache.put("c", ANSWER)
+    assert [cache.get(key) is not None for key in ("a", "b", "c")] == [True, False, True]
+
+
+def test_hits_and_misses_are_counted(tmp_path, monkeypatch):
+    cache, _ = cache_at(tmp_path, monkeypatch)
+    cache.get("k")
+    cache.put("k", ANSWER)
+    cache.get("k")
+    cache.get("k")
+    assert cache.stats() == {"hits": 2, "misses": 1, "hit_ratio": 0.667}
@@ -0,0 +1,104 @@
+import pandas as pd
+
+from src.monitor import AlertMonitor, TickerMonitor
+
+HOUR = 3600
+
+
+def closes(*legs):
+    """A price path made of straight legs: (bars, step per bar)."""
+    price, path = 100.0, []
+    for n, step in legs:
+        for _ in range(n):
+            price += step
+            path.append(price)
+    return path
+
+
+def kinds(monitor, path, start=0, cooldown=0):
+    fired = []
+    for i, price in enumerate(path):
+        fired += [a["kind"] for a in monitor.update((start + i) * HOUR, price, cooldown)]
+    return fired
+
+
+def test_rsi_alerts_fire_once_per_zone_entry():
+    # Drift up gently, rally hard (overbought), then sell off hard (oversold)
+    path = closes(*[(1, 0.3), (1, -0.2)] * 20, (20, 1.0), (30, -1.0))
+    assert kinds(TickerMonitor("ABC"), path) == ["rsi_overbought", "rsi_oversold"]
+
+
+def test_sma_cross_alerts():
+    path = closes((250, -0.1), (200, 0.3), (200, -0.3))
+    fired = [k for k in kinds(TickerMonitor("ABC"), path) if k.endswith("cross")]
+    assert fired == ["golden_cross", "death_cross"]
+
+
+def test_nothing_fires_on_the_first_reading():
+    # Already overbought the moment RSI has enough history
+    assert kinds(TickerMonitor("ABC"), closes((40, 1.0))) == []
+
+
+def test_cooldown_suppresses_repeats():
+    whipsaw = closes(*[(1, 0.3), (1, -0.2)] * 10, (20, 1.0), (20, -0.5), (20, 1.0))
+    assert kinds(TickerMonitor("ABC"), whipsaw).count("rsi_overbought") == 2
+    assert kinds(TickerMonitor("ABC"), whipsaw, cooldown=1000 * HOUR).count("rsi_overbought") == 1
+
+
+def test_state_round_trips_and_skips_seen_bars(tmp_path):
+    path = closes(*[(1, 0.3), (1, -0.2)] * 20, (20, 1.0))
+    index = pd.date_range("2026-01-05 14:30", periods=len(path), freq="h", tz="UTC")
+    close = pd.DataFrame({"ABC": path}, index=index)
+    sent = []
+
+    def send(to, subject, body):
+        sent.append((to, subject))
+        return True
+
+    subscribers = {"abc": {"a@x.dev", "b@x.dev"}, "XYZ": {"c@x.dev"}}
+    monitor = AlertMonitor(subscribers, state_path=str(tmp_path / "m.json"), send=send)
+    monitor.feed(close.iloc[:40], notify=False)
+    monitor.save()
+
+    restored = AlertMonitor(subscribers, state_path=str(tmp_path / "m.json"), send=send)
+    # The overlapping bars are skipped; only the rally is new
+    alerts = restored.feed(close)
+    assert [a["kind"] for a in alerts] == ["rsi_overbought"]
+    assert restored.notify(alerts) == 2
+    assert sorted(to for to, _ in sent) == ["a@x.dev", "b@x.dev"]
+    assert sent[0][1].startswith("Naxera AI Alert: ABC RSI")
+    assert restored.feed(close) == []
+
+
+def test_poll_waits_for_the_newest_bar_to_close(tmp_path, monkeypatch):
+    index = pd.date_range(pd.Timestamp.now(tz="UTC").floor("5min") - pd.Timedelta("15min"), periods=3, freq="5min")
+    polls = [
+        pd.DataFrame({"ABC": [100.0, 101.0, 150.0]}, index=index),  # last bar still forming
+        pd.DataFrame({"ABC": [100.0, 101.0, 102.0, 103.0]}, index=index.append(index[-1:] + pd.Timedelta("5min"))),
+    ]
+    monitor = AlertMonitor({"ABC": {"a@x.dev"}}, state_path=str(tmp_path / "m.json"), send=lambda **kw: True)
+    windows = []
+
+    def download(period=None, tickers=None, start=None):
+        windows.append((period, start))
+        return polls[len(windows) - 1]
+
+    monkeypatch.setattr(monitor, "_download", download)
+    monitor.poll()
+    assert monitor.monitors["ABC"].sma_fast.buffer == [100.0, 101.0]
+    monitor.poll()
+    # The final close replaced the mid-bar one
+    assert monitor.monitors["ABC"].sma_fast.buffer == [100.0, 101.0, 102.0]
+    assert windows == [("1d", None), (None, index[0].date())]
+
+
+def test_poll_reaches_back_to_the_oldest_state(tmp_path, monkeypatch):
+    monitor = AlertMonitor({"ABC": {"a@x.dev"}, "XYZ": {"b@x.dev"}}, state_path=str(tmp_path / "m.json"))
+    now = pd.Timestamp.now(tz="UTC")
+    monitor._monitor("ABC").last_ts = int((now - pd.Timedelta(days=3)).timestamp())
+    monitor._monitor("XYZ").last_ts = int((now - pd.Timedelta(hours=1)).timestamp())
+    assert monitor._since() == (now - pd.Timedelta(days=3)).date()
+
+    # Never further back than Yahoo serves intraday bars
+    monitor._monitor("ABC").last_ts = int((now - pd.Timedelta(days=90)).timestamp())
+    assert monitor._since() == (now - pd.Timedelta(days=59)).date()
@@ -0,0 +1,99 @@
+import json
+
+import pytest
+import tavily
+import yfinance
+
+import main
+import src.clients
+import src.outbox
+from bench import standins
+from src.outbox import FileTransport
+from src.sharding import Shard
+
+PORTFOLIOS = {
+    f"user{i}@test.dev": [{"ticker": ticker, "shares": 10, "uuid": f"u{i}"} for ticker in ("AAA", "BBB")]
+    for i in range(3)
+}
+
+
+@pytest.fixture
+def offline(tmp_path, monkeypatch):
+    """The real pipeline against the bench stand-ins, with state in a temp directory."""
+    monkeypatch.setenv("NAXERA_DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setattr(yfinance, "download", standins.fake_download)
+    monkeypatch.setattr(yfinance, "Ticker", standins.FakeTicker)
+    monkeypatch.setattr(tavily.TavilyClient, "search", standins.fake_search)
+    llm = standins.FakeLLM()
+    monkeypatch.setattr(src.clients, "get_llm", lambda: llm)
+    # No real backoff between send retries
+    monkeypatch.setattr(src.outbox.time, "sleep", lambda seconds: None)
+    return tmp_path
+
+
+def test_undelivered_reports_are_counted_as_failed(offline, monkeypatch):
+    transport = FileTransport(str(offline / "mail"), failure_rate=1.0)
+    monkeypatch.setattr(src.outbox, "transport_from_env", lambda: transport)
+
+    summary = main.run_pipeline(PORTFOLIOS, concurrency=2, run_date="2026-03-02", resume=False)
+    assert transport.calls > 1  # retried before giving up
+    assert summary["succeeded"] == []
+    assert set(summary["failed"]) == set(PORTFOLIOS)
+    assert all("simulated transport failure" in error for error in summary["failed"].values())
+
+    # So the shard manifest does not claim coverage either
+    path = str(offline / "manifest.json")
+    Shard(0, 1).write_manifest(path, summary, "2026-03-02")
+    with open(path) as f:
+        manifest = json.load(f)
+    assert manifest["succeeded"] == [] and len(manifest["failed"]) == 3
+
+
+def test_second_run_on_the_same_date_sends_nothing(offline, monkeypatch):
+    transport = FileTransport(str(offline / "mail"))
+    monkeypatch.setattr(src.outbox, "transport_from_env", lambda: transport)
+
+    first = main.run_pipeline(PORTFOLIOS, concurrency=2, run_date="2026-03-02", resume=False)
+    assert set(first["succeeded"]) == set(PORTFOLIOS)
+    # Wall time covers the whole run, not just the user graphs
+    assert first["wall_time"] >= sum(first["stages"].values())
+    calls = transport.calls
+
+    second = main.run_pipeline(PORTFOLIOS, concurrency=2, run_date="2026-03-02", resume=False)
+    assert transport.calls == calls
+    assert set(second["skipped"]) | set(second["succeeded"]) == set(PORTFOLIOS)
+    assert second["failed"] == {}
+
+
+def outbox(tmp_path, transport, **kwargs):
+    log = src.outbox.SendLog(str(tmp_path / "outbox.sqlite"))
+    return src.outbox.Outbox(transport=transport, log=log, run_date="2026-03-02", **kwargs)
+
+
+def test_one_refused_message_does_not_fail_its_chunk(offline):
+    transport = FileTransport(str(offline / "mail"), reject={"user1@test.dev"})
+    box = outbox(offline, transport, chunk_size=10)
+    for to in PORTFOLIOS:
+        box.enqueue(to, "report", "<p>hi</p>")
+    box.flush()
+
+    assert transport.calls == 1  # a 422 is permanent: not retried
+    assert box.stats() == {"sent": 2, "skipped": 0, "retries": 0, "failed": 1}
+    assert "invalid recipient" in box.failed["user1@test.dev"]
+    assert box.delivered("user0@test.dev") and not box.delivered("user1@test.dev")
+
+    # The users who got it stay skipped when the job runs again
+    again = outbox(offline, FileTransport(str(offline / "mail")), chunk_size=10)
+    assert [again.enqueue(to, "report", "<p>hi</p>") for to in PORTFOLIOS] == [False, True, False]
+    again.flush()
+    assert again.stats() == {"sent": 1, "skipped": 2, "retries": 0, "failed": 0}
+
+
+def test_outbox_sends_in_chunks_of_chunk_size(offline):
+    transport = FileTransport(str(offline / "mail"))
+    box = outbox(offline, transport, chunk_size=2)
+    for i in range(5):
+        box.enqueue(f"user{i}@test.dev", "report", "<p>hi</p>")
+    box.flush()
+    assert transport.chunks == [2, 2, 1]
+    assert box.sent == 5
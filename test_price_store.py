@@ -0,0 +1,68 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+import yfinance
+
+from src.bulk_fetch import download_bars
+from src.price_store import PriceStore
+
+
+def daily_bars(days, seed=3):
+    index = pd.bdate_range("2026-01-01", periods=days)
+    close = 100 + np.cumsum(np.random.default_rng(seed).normal(0, 1, days))
+    return pd.DataFrame(
+        {"Open": close, "High": close + 1, "Low": close - 1, "Close": close, "Volume": 1e6}, index=index
+    )
+
+
+@pytest.fixture
+def yahoo(monkeypatch):
+    """Serves `source[ticker]` through yf.download and records the window of every request."""
+    state = {"source": {}, "requests": []}
+
+    def download(tickers, period=None, start=None, interval="1d", **kwargs):
+        state["requests"].append({"tickers": list(tickers), "period": period, "start": start, "interval": interval})
+        frames = {}
+        for ticker in tickers:
+            frame = state["source"][ticker]
+            frames[ticker] = frame[frame.index >= pd.Timestamp(start)] if start is not None else frame
+        return pd.concat(frames, axis=1)
+
+    monkeypatch.setattr(yfinance, "download", download)
+    return state
+
+
+def test_download_bars_sends_the_requested_window(yahoo):
+    yahoo["source"] = {t: daily_bars(30) for t in "ABC"}
+
+    frames, requests = download_bars(["A", "B", "C"], period="1y", batch_size=2)
+    assert requests == 2
+    assert [r["tickers"] for r in yahoo["requests"]] == [["A", "B"], ["C"]]
+    assert all(r["period"] == "1y" and r["start"] is None for r in yahoo["requests"])
+    assert len(frames["C"]) == 30
+
+    yahoo["requests"].clear()
+    download_bars(["A"], start=datetime.date(2026, 2, 1), batch_size=2)
+    assert yahoo["requests"] == [{"tickers": ["A"], "period": None, "start": datetime.date(2026, 2, 1), "interval": "1d"}]
+
+
+def test_sync_fetches_only_new_bars_and_merges_them(tmp_path, yahoo):
+    full = daily_bars(60)
+    store = PriceStore(str(tmp_path / "prices.sqlite"))
+
+    yahoo["source"] = {"A": full.iloc[:40]}
+    frames, _ = store.sync(["A"], "1y", "1d")
+    assert yahoo["requests"][-1]["period"] == "1y"
+    assert len(frames["A"]) == 40
+
+    # Next run: 20 new bars. Only the tail since the last stored bar (less the overlap) is requested
+    yahoo["source"] = {"A": full}
+    frames, _ = store.sync(["A"], "1y", "1d")
+    request = yahoo["requests"][-1]
+    assert request["period"] is None
+    assert request["start"] == (full.index[39] - pd.Timedelta(days=5)).date()
+    assert frames["A"].index.equals(full.index)
+    assert np.allclose(frames["A"]["Close"], full["Close"])
+    store.close()
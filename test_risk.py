@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+import src.market_data as market_data
+from src.market_data import MarketData
+from src.report import render_report
+from src.risk import ReturnsMatrix
+
+
+def make_histories(n_days=260, seed=11):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2025-01-01", periods=n_days)
+    market = rng.normal(0.0004, 0.01, n_days)
+    histories = {"SPY": pd.DataFrame({"Close": 400 * np.exp(np.cumsum(market))}, index=dates)}
+    for i, beta in enumerate((0.5, 1.0, 1.5)):
+        daily = beta * market + rng.normal(0, 0.01, n_days)
+        histories[f"T{i}"] = pd.DataFrame({"Close": 50 * np.exp(np.cumsum(daily))}, index=dates)
+    # Listed 60 days ago
+    histories["NEW"] = histories["T1"].iloc[-60:] * 0.3
+    return histories
+
+
+def reference_risk(histories, values):
+    """Straightforward per-portfolio pandas math on the days every holding (and SPY) has a return."""
+    close = pd.DataFrame({t: h["Close"] for t, h in histories.items() if t in values or t == "SPY"})
+    returns = close.pct_change(fill_method=None).iloc[1:].dropna()
+    weights = pd.Series(values) / sum(values.values())
+    daily = (returns[list(values)] * weights).sum(axis=1)
+    worst = np.sort(daily.to_numpy())[: int(np.ceil(0.05 * len(daily)))]
+    wealth = (1 + daily).cumprod()
+    corr = returns[list(values)].corr()
+    return {
+        "volatility": daily.std() * np.sqrt(252),
+        "beta": np.cov(daily, returns["SPY"])[0, 1] / returns["SPY"].var(),
+        "var_95": -worst[-1],
+        "cvar_95": -worst.mean(),
+        "max_drawdown": min((wealth / wealth.cummax().clip(lower=1.0)).min() - 1, 0.0),
+        "avg_correlation": corr.to_numpy()[np.triu_indices(len(values), 1)].mean(),
+    }
+
+
+def test_matches_per_portfolio_reference():
+    histories = make_histories()
+    matrix = ReturnsMatrix(histories)
+    for values in ({"T0": 1000.0, "T2": 3000.0}, {"T0": 1.0, "T1": 2.0, "T2": 3.0, "NEW": 4.0}):
+        risk = matrix.portfolio_risk(values)
+        for name, expected in reference_risk(histories, values).items():
+            assert np.isclose(risk[name], expected), name
+        assert risk["coverage"] == 1.0
+
+
+def test_other_users_calendars_do_not_change_a_portfolio():
+    histories = make_histories()
+    values = {"T0": 1000.0, "T1": 500.0}
+    alone = ReturnsMatrix(histories).portfolio_risk(values)
+
+    days = pd.date_range("2024-12-01", periods=420)
+    btc = pd.DataFrame({"Close": 30000 * np.exp(np.cumsum(np.random.default_rng(5).normal(0, 0.03, 420)))}, index=days)
+    matrix = ReturnsMatrix({**histories, "BTC-USD": btc})
+    assert matrix.portfolio_risk(values) == alone
+    assert alone["days"] == len(histories["SPY"]) - 1
+
+    # Crypto itself is measured on the benchmark's days, weekend moves included
+    risk = matrix.portfolio_risk({"BTC-USD": 1.0})
+    spy_days = histories["SPY"].index
+    expected = btc["Close"].reindex(spy_days).pct_change().iloc[1:]
+    assert risk["days"] == len(expected)
+    assert np.isclose(risk["volatility"], expected.std() * np.sqrt(252))
+
+
+def test_beta_tracks_market_exposure():
+    matrix = ReturnsMatrix(make_histories())
+    betas = [matrix.portfolio_risk({t: 1.0})["beta"] for t in ("T0", "T1", "T2", "SPY")]
+    assert betas[0] < betas[1] < betas[2]
+    assert np.isclose(betas[3], 1.0)
+
+
+def test_correlations_and_coverage():
+    matrix = ReturnsMatrix(make_histories())
+    risk = matrix.portfolio_risk({"t0": 1.0, "T2": 1.0, "GONE": 2.0})
+    assert risk["coverage"] == 0.5
+    assert [pair[:2] for pair in risk["correlations"]] == [["T0", "T2"]]
+    assert risk["avg_correlation"] == risk["correlations"][0][2]
+    assert matrix.portfolio_risk({"T0": 1.0})["correlations"] == []
+    assert matrix.portfolio_risk({"GONE": 1.0}) == {}
+
+
+def test_returns_matrix_is_shared_until_tickers_join(monkeypatch):
+    histories = make_histories()
+    monkeypatch.setattr(market_data, "_history", lambda ticker, **window: histories[ticker])
+    md = MarketData()
+    md.history("T0")
+    first = md.returns()
+    assert md.returns() is first
+    assert sorted(first.tickers) == ["SPY", "T0"]
+    md.history("T1")
+    assert md.returns() is not first
+    assert sorted(md.returns().tickers) == ["SPY", "T0", "T1"]
+
+
+def test_report_shows_risk_panel():
+    risk = ReturnsMatrix(make_histories()).portfolio_risk({"T0": 1.0, "T2": 1.0})
+    html = render_report([], {}, 2.0, "https://example.com", risk=risk)
+    assert "Portfolio Risk" in html and "Beta vs SPY" in html and "T0 / T2" in html
+    assert "Portfolio Risk" not in render_report([], {}, 2.0, "https://example.com", risk={})
@@ -0,0 +1,53 @@
+from src.sharding import Shard, email_digest, merge, shard_of
+
+EMAILS = [f"user{i}@test.dev" for i in range(200)]
+PORTFOLIOS = [(email, [{"ticker": "AAPL", "shares": 1.0, "uuid": email}]) for email in EMAILS]
+
+
+def run_shards(tmp_path, count: int, fail=()):
+    manifests = []
+    for index in range(count):
+        shard = Shard(index, count)
+        emails = [email for email, _ in shard.select(PORTFOLIOS)]
+        summary = {
+            "succeeded": [e for e in emails if e not in fail],
+            "failed": {e: "boom" for e in emails if e in fail},
+        }
+        manifests.append(shard.write_manifest(str(tmp_path / f"shard-{index}.json"), summary, "2026-01-02"))
+    return manifests
+
+
+def test_assignment_is_stable_and_case_insensitive():
+    assert shard_of("Someone@Example.com ", 8) == shard_of("someone@example.com", 8)
+    assert email_digest("a@b.c") == email_digest("A@B.C")
+    # Pinned: a change here would silently move users between CI shards
+    assert [shard_of(e, 4) for e in EMAILS[:6]] == [1, 1, 2, 3, 3, 1]
+
+
+def test_shards_partition_users_exactly_once():
+    for count in (1, 3, 8):
+        seen = []
+        for index in range(count):
+            seen += [email for email, _ in Shard(index, count).select(PORTFOLIOS)]
+        assert sorted(seen) == sorted(EMAILS)
+
+
+def test_merge_accepts_complete_runs_and_reports_failures(tmp_path):
+    report = merge(run_shards(tmp_path, 4, fail={"user7@test.dev"}))
+    assert report["problems"] == []
+    assert report["users"] == len(EMAILS)
+    assert list(report["failed"]) == [email_digest("user7@test.dev")]
+
+
+def test_merge_flags_missing_and_duplicated_shards(tmp_path):
+    manifests = run_shards(tmp_path, 4)
+    assert any("missing shards: [2]" in p for p in merge(manifests[:2] + manifests[3:])["problems"])
+    assert any("more than once" in p for p in merge(manifests + manifests[:1])["problems"])
+
+
+def test_merge_flags_users_a_shard_skipped(tmp_path):
+    manifests = run_shards(tmp_path, 2)
+    manifests[0]["succeeded"] = manifests[0]["succeeded"][1:]
+    problems = merge(manifests)["problems"]
+    assert any("processed" in p and "assigned" in p for p in problems)
+    assert any("expected 200" in p for p in problems)
@@ -0,0 +1,48 @@
+from bench.standins import FakeSupabase, calls
+from src.subscriptions import iter_portfolios
+
+
+def make_rows():
+    rows = []
+    for u, holdings in enumerate([2, 1, 7, 3, 1]):
+        for h in range(holdings):
+            rows.append({
+                "email": f"user{u}@test.dev",
+                "ticker": f"T{h}",
+                "shares": str(h + 1),
+                "uuid": f"{u:02d}-{h:02d}",
+                "active": True,
+                "user_id": u,
+            })
+    rows.append({"email": "user1@test.dev", "ticker": "OLD", "shares": "1", "uuid": "01-99", "active": False})
+    return rows[::-1]
+
+
+def test_every_portfolio_is_complete_for_any_page_size():
+    rows = make_rows()
+    expected = {}
+    for r in rows:
+        if r["active"]:
+            expected.setdefault(r["email"], set()).add(r["ticker"])
+
+    # Page sizes smaller than the largest portfolio exercise the per-user paging
+    for page_size in (1, 2, 3, 5, 8, 100):
+        seen = list(iter_portfolios(FakeSupabase(rows), page_size=page_size))
+        emails = [email for email, _ in seen]
+        assert emails == sorted(expected)
+        assert {email: {h["ticker"] for h in portfolio} for email, portfolio in seen} == expected
+
+
+def test_only_needed_columns_are_fetched():
+    for _, portfolio in iter_portfolios(FakeSupabase(make_rows()), page_size=4):
+        for holding in portfolio:
+            assert set(holding) == {"ticker", "shares", "uuid"}
+            assert isinstance(holding["shares"], float)
+
+
+def test_portfolios_stream_before_the_table_is_read():
+    before = calls.counts["supabase.select"]
+    loader = iter_portfolios(FakeSupabase(make_rows()), page_size=3)
+    email, _ = next(loader)
+    assert email == "user0@test.dev"
+    assert calls.counts["supabase.select"] - before == 1